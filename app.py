@@ -1,8 +1,6 @@
 
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, url_for
 from flask_cors import CORS
-from pymongo.mongo_client import MongoClient
-from pymongo.server_api import ServerApi
 from dotenv import load_dotenv
 import pandas as pd
 import io
@@ -10,8 +8,20 @@ import os
 from utils import *
 
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 import pymysql
+from pymongo.errors import OperationFailure
 from sqlalchemy import create_engine
+from db import MySQLPool, get_mongo_db, mongo_stats
+from cache import ResultCache, SchemaCache, TranslationCache, pipeline_result_key, sql_result_key
+from semantic_cache import SemanticCache
+from ingest import UPLOAD_ENGINES, IngestError, insert_csv_mongodb, upload_csv_mysql
+from jobs import JobRegistry, UploadJob, open_spooled, spool_uploads
+from mongo_schema import profile_database
+from gemini import LLMUnavailableError, llm_deadline, translator_stats
+from regex import sql_to_mongo_stats
+from router import TranslatorRouter
 
 
 
@@ -24,11 +34,9 @@ app = Flask(__name__,
 )
 CORS(app)
 
-globalOption=0
 
 
-
-def get_RDS_connection_without_db():
+def get_RDS_connection(db_name=None, read_only=False):
     try:
         host = os.getenv('RDS_HOST')
         port = int(os.getenv('RDS_PORT', '3306').split('#')[0].strip())
@@ -38,14 +46,20 @@ def get_RDS_connection_without_db():
         if not all([host, user, password]):
             raise ValueError("Missing required RDS configuration. Please check your .env file.")
         
+        # The database is selected during the handshake, so no USE or DDL
+        # round trips are needed before the first query.
         connection = pymysql.connect(
             host=host,
             port=port,
             user=user,
             password=password,
+            database=db_name,
             connect_timeout=10,
             read_timeout=10,
-            write_timeout=10
+            write_timeout=10,
+            autocommit=True,
+            init_command="SET SESSION TRANSACTION READ ONLY" if read_only else None,
+            local_infile=not read_only
         )
         print("Connected to RDS successfully!")
         return connection
@@ -56,19 +70,168 @@ def get_RDS_connection_without_db():
         print(f"Configuration error: {e}")
         raise
 
-def create_and_use_database(db_name):
-    connection = get_RDS_connection_without_db()
+
+# Shared by every route so requests reuse warm connections instead of paying
+# a TCP+TLS+auth handshake against RDS each time.
+mysql_pool = MySQLPool(
+    connect=get_RDS_connection,
+    max_size=int(os.getenv('MYSQL_POOL_SIZE', '10')),
+    idle_timeout=float(os.getenv('MYSQL_POOL_IDLE_TIMEOUT', '300')),
+    max_lifetime=float(os.getenv('MYSQL_POOL_MAX_LIFETIME', '1800')),
+    checkout_timeout=float(os.getenv('MYSQL_POOL_CHECKOUT_TIMEOUT', '10'))
+)
+
+schema_cache = SchemaCache(
+    ttl=float(os.getenv('SCHEMA_CACHE_TTL', '300')),
+    shared_dir=os.getenv('SCHEMA_CACHE_SHARED_DIR')
+)
+
+translation_cache = TranslationCache(
+    max_entries=int(os.getenv('TRANSLATION_CACHE_SIZE', '1024')),
+    ttl=float(os.getenv('TRANSLATION_CACHE_TTL', '3600'))
+)
+
+# Off unless RESULT_CACHE_MAX_BYTES is set.
+result_cache = ResultCache(
+    max_bytes=int(os.getenv('RESULT_CACHE_MAX_BYTES', '0')),
+    ttl=float(os.getenv('RESULT_CACHE_TTL', '60'))
+)
+
+semantic_cache = SemanticCache(
+    threshold=float(os.getenv('SEMANTIC_CACHE_THRESHOLD', '0.9')),
+    max_entries=int(os.getenv('SEMANTIC_CACHE_SIZE', '512'))
+)
+
+# "rules", "llm" or "hybrid" (rules first, LLM when they miss); requests may
+# override it with a "translator" field.
+translator_router = TranslatorRouter(
+    mode=os.getenv('TRANSLATOR_MODE', 'hybrid'),
+    min_confidence=float(os.getenv('TRANSLATOR_MIN_CONFIDENCE', '0.75')),
+    cache=translation_cache,
+    semantic_cache=semantic_cache
+)
+# Seconds all LLM calls of one request may take, retries included.
+llm_request_budget = float(os.getenv('LLM_REQUEST_BUDGET', '60'))
+
+known_databases = set()
+known_databases_lock = threading.Lock()
+
+
+def ensure_database(db_name):
+    """Create ``db_name`` if needed, at most once per database per process."""
+    if db_name in known_databases:
+        return
+    with known_databases_lock:
+        if db_name in known_databases:
+            return
+        try:
+            with mysql_pool.connection() as connection:
+                with connection.cursor() as cursor:
+                    cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{db_name}`")
+        except pymysql.Error as e:
+            print(f"Error creating database: {e}")
+            raise
+        known_databases.add(db_name)
+
+
+UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', '4'))
+
+upload_jobs = JobRegistry(
+    max_workers=int(os.getenv('UPLOAD_JOB_WORKERS', '2')),
+    retention=float(os.getenv('UPLOAD_JOB_RETENTION', '3600'))
+)
+
+
+def is_async_upload():
+    return request.form.get('async', 'true').lower() not in ('false', '0', 'no')
+
+
+def start_upload_job(backend, db_name, files, run_upload):
+    """Spool the request's files to disk and run ``run_upload(files, job)`` in the background."""
+    spooled = spool_uploads(files)
+    job = UploadJob(backend, db_name, [
+        (filename, os.path.getsize(path) if path else None) for filename, path in spooled
+    ])
+
+    def run(job):
+        with open_spooled(spooled) as spooled_files:
+            run_upload(spooled_files, job)
+
+    upload_jobs.submit(job, run)
+    return jsonify({
+        "message": f"Upload started for database: {db_name}",
+        "job_id": job.id,
+        # Built by Flask so it carries the prefix the app is mounted under.
+        "status_url": url_for('get_job', job_id=job.id)
+    }), 202
+
+
+def table_name_for(filename):
+    """The table (or collection) an uploaded CSV is stored in: its base name without extension."""
+    return os.path.basename(filename).rsplit('.', 1)[0]
+
+
+def run_file_uploads(files, upload_file, job=None):
+    """Fan ``upload_file(file, progress)`` out over the upload workers, reporting to ``job``."""
+    def upload(index, file):
+        progress = job.progress_callback(index) if job else None
+        result = upload_file(file, progress)
+        if job:
+            job.file_finished(index, result)
+        return result
+
+    with ThreadPoolExecutor(max_workers=min(UPLOAD_WORKERS, len(files))) as executor:
+        return list(executor.map(upload, range(len(files)), files))
+
+
+def run_mysql_upload(db_name, files, engine, job=None):
+    ensure_database(db_name)
     try:
-        with connection.cursor() as cursor:
-            cursor.execute(f"CREATE DATABASE IF NOT EXISTS {db_name}")
-            cursor.execute(f"USE {db_name}")
-            connection.commit()
-        return connection
-    except pymysql.Error as e:
-        if connection:
-            connection.close()
-        print(f"Error creating database: {e}")
-        raise
+        # Each file gets its own worker, connection and transaction, so one
+        # bad file does not hold up or roll back the others.
+        return run_file_uploads(
+            files,
+            lambda file, progress: upload_mysql_file(db_name, file, engine, progress=progress),
+            job
+        )
+    finally:
+        # Tables may have been created even if some files failed.
+        schema_cache.invalidate("mysql", db_name)
+        result_cache.invalidate("mysql", db_name, {table_name_for(file.filename) for file in files if file.filename})
+
+
+def upload_mysql_file(db_name, file, engine, progress=None):
+    """Load one uploaded CSV on its own pooled connection and return its result entry."""
+    if file.filename == '' or not file.filename.endswith('.csv'):
+        return {
+            "filename": file.filename,
+            "status": "error",
+            "message": "Invalid file format. Please upload a CSV file"
+        }
+
+    table_name = table_name_for(file.filename)
+    try:
+        with mysql_pool.connection(db_name) as connection:
+            load_result = upload_csv_mysql(connection, table_name, file.stream, engine=engine, progress=progress)
+        return {
+            "filename": file.filename,
+            "status": "success",
+            "table": table_name,
+            **load_result
+        }
+    except IngestError as e:
+        return {
+            "filename": file.filename,
+            "status": "error",
+            "message": str(e),
+            "rows_inserted": e.rows_committed
+        }
+    except Exception as e:
+        return {
+            "filename": file.filename,
+            "status": "error",
+            "message": str(e)
+        }
 
 
 """
@@ -78,10 +241,12 @@ curl -X POST \
   -F "files=@school/enrollments.csv" \
   -F "files=@school/students.csv" \
   http://127.0.0.1:8080/api/upload-mysql
+
+Optional: -F "engine=insert|load_data|auto" (default auto)
+          -F "async=false" to wait for the upload instead of getting a job id
 """
 @app.route('/api/upload-mysql', methods=['POST'])
 def upload_to_rds():
-    connection = None
     try:
         if 'files' not in request.files:
             return jsonify({"error": "No files uploaded"}), 400
@@ -91,65 +256,21 @@ def upload_to_rds():
 
         files = request.files.getlist('files')
         db_name = request.form['db_name']
+        engine = request.form.get('engine', 'auto')
         
         if not files:
             return jsonify({"error": "No files selected"}), 400
 
-        connection = create_and_use_database(db_name)
-        
-        upload_results = []
-        
-        for file in files:
-            if file.filename == '' or not file.filename.endswith('.csv'):
-                upload_results.append({
-                    "filename": file.filename,
-                    "status": "error",
-                    "message": "Invalid file format. Please upload a CSV file"
-                })
-                continue
-
-            try:
-                table_name = os.path.basename(file.filename).rsplit('.', 1)[0]
-                df = pd.read_csv(io.StringIO(file.stream.read().decode("UTF8")))
-
-                columns = []
-                for column, dtype in df.dtypes.items():
-                    if dtype == 'int64':
-                        sql_type = 'INT'
-                    elif dtype == 'float64':
-                        sql_type = 'FLOAT'
-                    else:
-                        sql_type = 'VARCHAR(255)'
-                    columns.append(f"`{column}` {sql_type}")
-                
-                create_table_query = f"""
-                CREATE TABLE IF NOT EXISTS `{table_name}` (
-                    {', '.join(columns)}
-                )
-                """
+        if engine not in UPLOAD_ENGINES:
+            return jsonify({"error": f"Unknown upload engine '{engine}'. Use one of: {', '.join(UPLOAD_ENGINES)}"}), 400
 
-                placeholders = ', '.join(['%s'] * len(df.columns))
-                insert_query = f"INSERT INTO `{table_name}` ({', '.join([f'`{col}`' for col in df.columns])}) VALUES ({placeholders})"
+        if is_async_upload():
+            return start_upload_job(
+                "mysql", db_name, files,
+                lambda spooled_files, job: run_mysql_upload(db_name, spooled_files, engine, job)
+            )
 
-                with connection.cursor() as cursor:
-                    cursor.execute(create_table_query)
-                    cursor.executemany(insert_query, df.values.tolist())
-                    connection.commit()
-
-                upload_results.append({
-                    "filename": file.filename,
-                    "status": "success",
-                    "table": table_name,
-                    "rows_inserted": len(df)
-                })
-
-            except Exception as e:
-                connection.rollback()
-                upload_results.append({
-                    "filename": file.filename,
-                    "status": "error",
-                    "message": str(e)
-                })
+        upload_results = run_mysql_upload(db_name, files, engine)
 
         return jsonify({
             "message": f"Upload process completed to database: {db_name}",
@@ -160,10 +281,6 @@ def upload_to_rds():
         return jsonify({
             "error": str(e)
         }), 500
-    finally:
-        if connection:
-            connection.close()
-            print("RDS connection closed")
 
     
 """
@@ -171,13 +288,13 @@ curl -X POST http://127.0.0.1:5000/api/query-mysql \
 -H "Content-Type: application/json" \
 -d '{
     "db_name": "database2", 
-    "query": "get Grade, Major where Grade is not null"
+    "query": "get Grade, Major where Grade is not null",
+    "translator": "hybrid"
 }'
 """
     
 @app.route('/api/query-mysql', methods=['POST'])
 def query_mysql():
-    connection = None
     try:
         data = request.get_json()
         if not data or 'query' not in data or 'db_name' not in data:
@@ -187,64 +304,136 @@ def query_mysql():
 
         query_str = data['query']
         db_name = data['db_name']
-        schema = get_mysql_schema(db_name)
-        query =  query_generator(query_str,schema,database="sql",option=globalOption)
-        connection = create_and_use_database(db_name)
-        print(query)
         try:
-            with connection.cursor() as cursor:
-                cursor.execute(query)
-                
-                columns = [desc[0] for desc in cursor.description]
-                rows = cursor.fetchall()
-                results = [dict(zip(columns, row)) for row in rows]
-                # import pdb; pdb.set_trace()
-                return jsonify({
-                    "query": query,
-                    "results": results, 
-                    "count": len(results)
-                }), 200
+            mode = translator_router.resolve_mode(data.get('translator'))
+        except ValueError as e:
+            return jsonify({
+                "error": str(e)
+            }), 400
+        schema, foreign_keys, row_counts = get_mysql_metadata(db_name)
+        try:
+            with llm_deadline(llm_request_budget):
+                route = translator_router.translate_sql(query_str, schema, mode, foreign_keys, row_counts)
+        except LLMUnavailableError as e:
+            return jsonify({
+                "error": str(e)
+            }), 503
+        query = route.query
+        print(query)
 
+        def run_query():
+            with mysql_pool.connection(db_name, read_only=True) as connection:
+                with connection.cursor() as cursor:
+                    cursor.execute(query)
+
+                    columns = [desc[0] for desc in cursor.description]
+                    rows = cursor.fetchall()
+                    return [dict(zip(columns, row)) for row in rows]
+
+        try:
+            identity = sql_result_key(query) if result_cache.enabled else None
+            results, cached = result_cache.get("mysql", db_name, identity, run_query)
         except pymysql.Error as e:
+            translation_cache.discard(translation_cache.key(query_str, schema, "sql", route.option))
+            semantic_cache.discard(query_str, schema, "sql")
             return jsonify({
                 "error": f"Database error: {str(e)}"
             }), 500
 
+        # import pdb; pdb.set_trace()
+        return jsonify({
+            "query": query,
+            "results": results,
+            "count": len(results),
+            "cached": cached,
+            "translator": route.path
+        }), 200
+
     except Exception as e:
         return jsonify({
             "error": str(e)
         }), 500
-    finally:
-        if connection:
-            connection.close()
-            print("MySQL connection closed")
             
             
+MYSQL_TYPE_GROUPS = {
+    "int": {"tinyint", "smallint", "mediumint", "int", "integer", "bigint", "bit", "year"},
+    "float": {"float", "double", "decimal", "numeric", "real"},
+    "string": {"char", "varchar", "text", "tinytext", "mediumtext", "longtext", "enum", "set"},
+}
+
+
+def mysql_type_group(data_type):
+    for group, data_types in MYSQL_TYPE_GROUPS.items():
+        if data_type in data_types:
+            return group
+    return data_type
+
+
 def get_mysql_schema(db_name):
-    connection = None
+    return get_mysql_metadata(db_name)[0]
+
+
+def get_mysql_metadata(db_name):
+    """(schema, foreign keys, row counts) of a database, cached together until the next upload."""
+    return schema_cache.get("mysql", db_name, lambda: load_mysql_schema(db_name))
+
+
+def load_mysql_schema(db_name):
+    """
+    Fetch every table's columns, row estimate and foreign keys in one information_schema round trip.
+
+    Returns:
+        tuple: (schema, foreign_keys, row_counts) where schema maps table name ->
+              list of {"name", "type", "data_type", "nullable", "key"} in ordinal
+              order ("type" is one of int/float/string or the raw type),
+              foreign_keys is a tuple of (table, column, referenced table,
+              referenced column) and row_counts maps table -> InnoDB's row estimate
+    """
     try:
-        connection = create_and_use_database(db_name)
-        cursor = connection.cursor()
+        with mysql_pool.connection(db_name, read_only=True) as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    """
+                    SELECT c.TABLE_NAME, c.COLUMN_NAME, c.DATA_TYPE, c.IS_NULLABLE, c.COLUMN_KEY,
+                           t.TABLE_ROWS, k.REFERENCED_TABLE_NAME, k.REFERENCED_COLUMN_NAME
+                    FROM information_schema.COLUMNS c
+                    JOIN information_schema.TABLES t
+                      ON t.TABLE_SCHEMA = c.TABLE_SCHEMA AND t.TABLE_NAME = c.TABLE_NAME
+                    LEFT JOIN information_schema.KEY_COLUMN_USAGE k
+                      ON k.TABLE_SCHEMA = c.TABLE_SCHEMA AND k.TABLE_NAME = c.TABLE_NAME
+                     AND k.COLUMN_NAME = c.COLUMN_NAME AND k.REFERENCED_TABLE_SCHEMA = c.TABLE_SCHEMA
+                    WHERE c.TABLE_SCHEMA = %s
+                    ORDER BY c.TABLE_NAME, c.ORDINAL_POSITION
+                    """,
+                    (db_name,)
+                )
+                rows = cursor.fetchall()
+
         schema = {}
-        
-        cursor.execute("SHOW TABLES")
-        tables = cursor.fetchall()
-        
-        for table in tables:
-            table_name = table[0]
-            cursor.execute(f"SHOW COLUMNS FROM {table_name}")
-            columns = cursor.fetchall()
-            schema[table_name] = [column[0] for column in columns]
-            
-        return schema
+        foreign_keys = []
+        row_counts = {}
+        for (table_name, column_name, data_type, is_nullable, column_key,
+             table_rows, referenced_table, referenced_column) in rows:
+            columns = schema.setdefault(table_name, [])
+            # A column in several foreign keys comes back once per key.
+            if not columns or columns[-1]["name"] != column_name:
+                data_type = data_type.lower()
+                columns.append({
+                    "name": column_name,
+                    "type": mysql_type_group(data_type),
+                    "data_type": data_type,
+                    "nullable": is_nullable == "YES",
+                    "key": column_key
+                })
+            if table_rows is not None:
+                row_counts[table_name] = table_rows
+            if referenced_table is not None:
+                foreign_keys.append((table_name, column_name, referenced_table, referenced_column))
+        return schema, tuple(foreign_keys), row_counts
         
     except Exception as e:
         print(f"Error getting MySQL schema: {e}")
         raise e
-    finally:
-        if connection:
-            connection.close()
-            print("MySQL connection closed")
 
 """
 curl -X GET http://127.0.0.1:8080/api/get-mysql-schema/school
@@ -261,18 +450,54 @@ def get_mysql_schema_route(db_name):
         return jsonify({
             "error": str(e)
         }), 500
-        
-    
-def connect_mongodb(db_name):
+
+
+
+def run_mongodb_upload(db_name, files, job=None):
+    db = get_mongo_db(db_name)
+    try:
+        return run_file_uploads(
+            files,
+            lambda file, progress: upload_mongodb_file(db, file, progress=progress),
+            job
+        )
+    finally:
+        schema_cache.invalidate("mongodb", db_name)
+        result_cache.invalidate("mongodb", db_name, {table_name_for(file.filename) for file in files if file.filename})
+
+
+def upload_mongodb_file(db, file, progress=None):
+    """Insert one uploaded CSV into the collection named after it and return its result entry."""
+    if file.filename == '' or not file.filename.endswith('.csv'):
+        return {
+            "filename": file.filename,
+            "status": "error",
+            "message": "Invalid file format. Please upload a CSV file"
+        }
+
+    collection_name = table_name_for(file.filename)
     try:
-        uri = os.getenv('MONGODB_URI')
-        client = MongoClient(uri, server_api=ServerApi('1'))
-        client.admin.command('ping')
-        print("Successfully connected to MongoDB!")
-        return client, client[db_name]
+        load_result = insert_csv_mongodb(db[collection_name], file.stream, progress=progress)
+        return {
+            "filename": file.filename,
+            "status": "partial" if load_result["rows_failed"] else "success",
+            "collection": collection_name,
+            **load_result
+        }
+    except IngestError as e:
+        return {
+            "filename": file.filename,
+            "status": "error",
+            "message": str(e),
+            "rows_inserted": e.rows_committed
+        }
     except Exception as e:
-        print(f"Error connecting to MongoDB: {e}")
-        raise e
+        # e.g. InvalidName for a collection name pymongo rejects ("a$b.csv")
+        return {
+            "filename": file.filename,
+            "status": "error",
+            "message": str(e)
+        }
 
 
 """
@@ -282,10 +507,11 @@ curl -X POST \
   -F "files=@data/enrollments.csv" \
   -F "files=@data/students.csv" \
   http://127.0.0.1:5000/api/upload-mongodb
+
+Optional: -F "async=false" to wait for the upload instead of getting a job id
 """
 @app.route('/api/upload-mongodb', methods=['POST']) 
 def upload_data():
-    client = None
     try:
         if 'files' not in request.files:
             return jsonify({"error": "No files uploaded"}), 400
@@ -299,40 +525,13 @@ def upload_data():
         if not files:
             return jsonify({"error": "No files selected"}), 400
 
-        client, db = connect_mongodb(db_name)
-        
-        upload_results = []
-        
-        for file in files:
-            if file.filename == '' or not file.filename.endswith('.csv'):
-                upload_results.append({
-                    "filename": file.filename,
-                    "status": "error",
-                    "message": "Invalid file format. Please upload a CSV file"
-                })
-                continue
-
-            try:
-                collection_name = os.path.basename(file.filename).rsplit('.', 1)[0]
-                csv_data = pd.read_csv(io.StringIO(file.stream.read().decode("UTF8")))
-                records = csv_data.to_dict('records')
-
-                collection = db[collection_name]
-                collection.insert_many(records)
-                
-                upload_results.append({
-                    "filename": file.filename,
-                    "status": "success",
-                    "collection": collection_name,
-                    "rows_inserted": len(records)
-                })
-                
-            except Exception as e:
-                upload_results.append({
-                    "filename": file.filename,
-                    "status": "error",
-                    "message": str(e)
-                })
+        if is_async_upload():
+            return start_upload_job(
+                "mongodb", db_name, files,
+                lambda spooled_files, job: run_mongodb_upload(db_name, spooled_files, job)
+            )
+
+        upload_results = run_mongodb_upload(db_name, files)
         
         return jsonify({
             "message": f"Upload process completed to database: {db_name}",
@@ -343,10 +542,19 @@ def upload_data():
         return jsonify({
             "error": str(e)
         }), 500
-    finally:
-        if client:
-            client.close()
-            print("MongoDB connection closed")
+
+"""
+curl -X GET http://127.0.0.1:8080/api/jobs/<job_id>
+"""
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = upload_jobs.get(job_id)
+    if job is None:
+        return jsonify({
+            "error": f"Unknown job: {job_id}"
+        }), 404
+    return jsonify(job.to_dict()), 200
+
 
 """
 curl -X POST http://127.0.0.1:5000/api/query-mongodb \
@@ -358,7 +566,6 @@ curl -X POST http://127.0.0.1:5000/api/query-mongodb \
 """
 @app.route('/api/query-mongodb', methods=['POST'])
 def query_data():
-    client = None
     try:
         data = request.get_json()
         if not data or 'query' not in data or 'db_name' not in data:
@@ -368,6 +575,12 @@ def query_data():
             
         query_str = data['query']
         db_name = data['db_name']
+        try:
+            mode = translator_router.resolve_mode(data.get('translator'))
+        except ValueError as e:
+            return jsonify({
+                "error": str(e)
+            }), 400
         schema = get_collections_schema(db_name)
 
         
@@ -375,67 +588,74 @@ def query_data():
         max_attempts = 3
         success = False
 
-        while attempts < max_attempts and not success:
-            try:
-                query = query_generator(query_str, schema, database="mongodb", option=globalOption)
-                query = query.replace('\\"', '"')
-                print(query)
-                collection_name, pipeline = extract_mongo_query(query)
-                # import pdb; pdb.set_trace()
-                success = True
-            except ValueError as e:
-                attempts += 1
-                if attempts == max_attempts:
+        # Parse retries share the request's LLM budget, so they cannot multiply
+        # decompose's own retries into an unbounded wait.
+        with llm_deadline(llm_request_budget):
+            while attempts < max_attempts and not success:
+                try:
+                    route = translator_router.translate_mongo(query_str, schema, mode)
+                    query, collection_name, pipeline = route.query
+                    print(query)
+                    # import pdb; pdb.set_trace()
+                    success = True
+                except ValueError as e:
+                    attempts += 1
+                    if attempts == max_attempts:
+                        return jsonify({
+                            "error": str(e)
+                        }), 400
+                except LLMUnavailableError as e:
                     return jsonify({
                         "error": str(e)
-                    }), 400
-        client, db = connect_mongodb(db_name)
-        
-        collection = db[collection_name]
-        
-        results = list(collection.aggregate(pipeline))
+                    }), 503
+
+        def run_pipeline():
+            results = list(get_mongo_db(db_name)[collection_name].aggregate(pipeline))
+            for doc in results:
+                if '_id' in doc:
+                    doc['_id'] = str(doc['_id'])
+            return results
+
+        try:
+            identity = pipeline_result_key(collection_name, pipeline) if result_cache.enabled else None
+            results, cached = result_cache.get("mongodb", db_name, identity, run_pipeline)
+        except OperationFailure:
+            translation_cache.discard(translation_cache.key(query_str, schema, MONGO_PIPELINE_BACKEND, route.option))
+            semantic_cache.discard(query_str, schema, "mongodb")
+            raise
         # import pdb; pdb.set_trace()
-        for doc in results:
-            if '_id' in doc:
-                doc['_id'] = str(doc['_id'])
         print(results)
         return jsonify({
             "query": query,
             "results": results,
-            "count": len(results)
+            "count": len(results),
+            "cached": cached,
+            "translator": route.path
         }), 200
         
     except Exception as e:
         return jsonify({
             "error": str(e)
         }), 500
-    finally:
-        if client:
-            client.close()
-            print("MongoDB connection closed")
             
 
 def get_collections_schema(db_name):
-    client = None
+    return schema_cache.get("mongodb", db_name, lambda: load_collections_schema(db_name))
+
+
+def load_collections_schema(db_name):
+    """
+    Profile each collection from a ``$sample`` of its documents.
+
+    Returns:
+        dict: Collection name -> list of {"name", "type", "types", "null_ratio"}
+    """
     try:
-        client, db = connect_mongodb(db_name)
-        collections_schema = {}
-        
-        for collection_name in db.list_collection_names():
-            sample_doc = db[collection_name].find_one()
-            if sample_doc:
-                sample_doc.pop('_id', None)
-                collections_schema[collection_name] = list(sample_doc.keys())
-            
-        return collections_schema
+        return profile_database(get_mongo_db(db_name))
         
     except Exception as e:
         print(f"Error getting schema: {e}")
         raise e
-    finally:
-        if client:
-            client.close()
-            print("MongoDB connection closed")
 
 """
 curl -X GET http://127.0.0.1:5000/api/get-mongodb-schema/database2
@@ -454,36 +674,70 @@ def get_schema(db_name):
         }), 500
 
 
+"""
+curl -X GET http://127.0.0.1:8080/api/stats
+"""
+@app.route('/api/stats', methods=['GET'])
+def get_stats():
+    return jsonify({
+        "mysql_pool": mysql_pool.stats(),
+        "mongodb": mongo_stats(),
+        "schema_cache": schema_cache.stats(),
+        "translation_cache": translation_cache.stats(),
+        "result_cache": result_cache.stats(),
+        "semantic_cache": semantic_cache.stats(),
+        "translator_router": translator_router.stats(),
+        "llm": translator_stats(),
+        "sql_to_mongo_rules": sql_to_mongo_stats()
+    }), 200
+
+
+"""
+curl -X POST http://127.0.0.1:8080/api/sample-queries \
+-H "Content-Type: application/json" \
+-d '{"operation": "group by", "db": "mysql", "db_name": "school"}'
+
+Without db_name the queries are generated for the example school schema.
+"""
 @app.route('/api/sample-queries', methods=['POST'])
 def get_sample_queries():
     data = request.get_json()
     operation = data.get("operation", None)
     db = data.get("db", 'mysql')
-    schema = {
-        "courses": [ 
-            {"name": "CourseID", "type":"int"} ,
-            {"name": "CourseName", "type":"string"}, 
-            {"name": "InstructorID", "type":"int"}, 
-            {"name": "InstructorName", "type":"string"},
-            {"name": "CreditHours", "type":"int"} ],
+    db_name = data.get("db_name")
+    if db_name:
+        try:
+            schema = get_collections_schema(db_name) if db == 'mongodb' else get_mysql_schema(db_name)
+        except Exception as e:
+            return jsonify({
+                "error": str(e)
+            }), 500
+    else:
+        schema = {
+            "courses": [ 
+                {"name": "CourseID", "type":"int"} ,
+                {"name": "CourseName", "type":"string"}, 
+                {"name": "InstructorID", "type":"int"}, 
+                {"name": "InstructorName", "type":"string"},
+                {"name": "CreditHours", "type":"int"} ],
         
-        "enrollments": [
-            {"name": "EnrollmentID", "type":"int"},
-            {"name": "StudentID", "type":"int"},
-            {"name": "CourseID", "type":"int"},
-            {"name": "Semester", "type":"int"},
-            {"name": "Grade", "type":"string"}  ],
+            "enrollments": [
+                {"name": "EnrollmentID", "type":"int"},
+                {"name": "StudentID", "type":"int"},
+                {"name": "CourseID", "type":"int"},
+                {"name": "Semester", "type":"int"},
+                {"name": "Grade", "type":"string"}  ],
         
-        "students": [
-            {"name": "StudentID", "type":"int"},
-            {"name": "FirstName", "type":"string"},
-            {"name": "LastName", "type":"string"},
-            {"name": "Email", "type":"string"},
-            {"name": "Major", "type":"string"},
-            {"name": "AdvisorID", "type":"int"},
-            {"name": "AdvisorName", "type":"string"} ]
-    }
-    
+            "students": [
+                {"name": "StudentID", "type":"int"},
+                {"name": "FirstName", "type":"string"},
+                {"name": "LastName", "type":"string"},
+                {"name": "Email", "type":"string"},
+                {"name": "Major", "type":"string"},
+                {"name": "AdvisorID", "type":"int"},
+                {"name": "AdvisorName", "type":"string"} ]
+        }
+
 
     # Generate queries based on the operation
     sample_queries = generate_sample_queries(schema, operation=operation, db = db)
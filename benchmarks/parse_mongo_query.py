@@ -0,0 +1,89 @@
+"""
+Measure how long extract_mongo_query takes on deep and wide pipelines.
+
+    python benchmarks/parse_mongo_query.py --baseline 0d94c4f
+
+Pipelines nest $facet/$lookup sub-pipelines to the given depths, and the wide
+cases chain many $match stages. With --baseline the utils.py at that git
+revision is timed on the same text.
+"""
+import argparse
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def nested_pipeline(depth):
+    stage = {"$match": {"Grade": {"$gt": 90}, "Major": {"$in": ["CS", "EE"]}}}
+    pipeline = [stage]
+    for level in range(depth):
+        pipeline = [
+            stage,
+            {"$lookup": {"from": "courses", "localField": "CourseID", "foreignField": "CourseID",
+                         "as": f"level{level}", "pipeline": pipeline}},
+            {"$facet": {"inner": pipeline, "count": [{"$count": "n"}]}},
+        ]
+    return pipeline
+
+
+def wide_pipeline(stages):
+    return [{"$match": {f"field{i}": {"$gte": i, "$lte": i + 10}}} for i in range(stages)]
+
+
+def load_utils(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_baseline(revision):
+    try:
+        source = subprocess.check_output(["git", "show", f"{revision}:utils.py"], cwd=ROOT)
+    except subprocess.CalledProcessError:
+        sys.exit(f"Cannot read utils.py at revision {revision}")
+    with tempfile.NamedTemporaryFile(suffix=".py", delete=False) as f:
+        f.write(source)
+    try:
+        return load_utils("utils_baseline", f.name)
+    finally:
+        os.remove(f.name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", help="git revision to compare against")
+    parser.add_argument("--depths", default="1,2,4,6")
+    parser.add_argument("--widths", default="10,100,1000")
+    parser.add_argument("--number", type=int, default=20, help="parses per timing run")
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    modules = [("current", load_utils("utils_current", os.path.join(ROOT, "utils.py")))]
+    if args.baseline:
+        modules.insert(0, (args.baseline, load_baseline(args.baseline)))
+
+    cases = [(f"depth {d}", nested_pipeline(int(d))) for d in args.depths.split(",")]
+    cases += [(f"{w} stages", wide_pipeline(int(w))) for w in args.widths.split(",")]
+
+    print(f"{'case':<14} {'chars':>9}" + "".join(f"{label + ' (ms)':>18}" for label, _ in modules))
+    for label, pipeline in cases:
+        text = f"db.enrollments.aggregate({json.dumps(pipeline)});"
+        row = f"{label:<14} {len(text):>9}"
+        for _, module in modules:
+            try:
+                best = min(timeit.repeat(lambda: module.extract_mongo_query(text), number=args.number, repeat=3))
+                row += f"{best / args.number * 1000:>18.3f}"
+            except (ValueError, RecursionError) as e:
+                row += f"{'error: ' + type(e).__name__:>18}"
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Measure per-query latency of the regex NL -> SQL translator.
+
+    python benchmarks/translate_sql.py --baseline 88b20b1
+
+Times ``query_function_sql`` from the working tree and, with --baseline, the
+version of regex.py at that git revision, over the same questions against the
+example school schema.
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCHEMA = {
+    "courses": ["CourseID", "CourseName", "InstructorID", "InstructorName", "CreditHours"],
+    "enrollments": ["EnrollmentID", "StudentID", "CourseID", "Semester", "Grade"],
+    "students": ["StudentID", "FirstName", "LastName", "Email", "Major", "AdvisorID", "AdvisorName"]
+}
+
+QUERIES = [
+    "Count entries in courses",
+    "List unique Major in students",
+    "Calculate average of CreditHours in courses",
+    "Find maximum Grade in enrollments",
+    "List top 5 rows ordered by CreditHours in courses",
+    "Count total number of rows in students",
+    "List rows where FirstName starts with 'A' in students",
+    "Count rows where CreditHours value is between 1 and 3 in courses",
+    "List rows where Email is not null in students",
+    "Count rows where Major has any value in ('CS', 'EE') in students",
+    "List first 10 rows in enrollments",
+    "nothing matches this question",
+]
+
+
+def load_regex_module(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_baseline(revision):
+    source = subprocess.check_output(["git", "show", f"{revision}:regex.py"], cwd=ROOT)
+    with tempfile.NamedTemporaryFile(suffix=".py", delete=False) as f:
+        f.write(source)
+    try:
+        return load_regex_module("regex_baseline", f.name)
+    finally:
+        os.remove(f.name)
+
+
+def time_queries(module, number):
+    latencies = {}
+    # The translator prints its join decision on every call.
+    with contextlib.redirect_stdout(io.StringIO()):
+        for query in QUERIES:
+            best = min(timeit.repeat(lambda: module.query_function_sql(SCHEMA, query), number=number, repeat=5))
+            latencies[query] = best / number * 1e6
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", help="git revision to compare against")
+    parser.add_argument("--number", type=int, default=2000, help="calls per timing run")
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    runs = [("current", time_queries(load_regex_module("regex_current", os.path.join(ROOT, "regex.py")), args.number))]
+    if args.baseline:
+        runs.insert(0, (args.baseline, time_queries(load_baseline(args.baseline), args.number)))
+
+    print(f"{'query':<66}" + "".join(f"{label + ' (us)':>16}" for label, _ in runs))
+    for query in QUERIES:
+        print(f"{query[:65]:<66}" + "".join(f"{latencies[query]:>16.1f}" for _, latencies in runs))
+    print(f"{'mean':<66}" + "".join(f"{sum(l.values()) / len(l):>16.1f}" for _, l in runs))
+
+
+if __name__ == "__main__":
+    main()
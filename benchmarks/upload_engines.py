@@ -0,0 +1,73 @@
+"""
+Compare the MySQL upload engines against a running ChatDB server.
+
+    python benchmarks/upload_engines.py --url http://127.0.0.1:8080 \
+        --file country/city.csv --synthetic-rows 1000000
+
+Each file is uploaded once per engine into its own database so the runs do not
+append to each other's tables, and the rows/sec reported by the server is printed.
+"""
+import argparse
+import csv
+import os
+import random
+import string
+import tempfile
+
+import requests
+
+
+def write_synthetic_csv(path, rows):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["ID", "Name", "Score", "Category"])
+        for i in range(rows):
+            writer.writerow([
+                i,
+                ''.join(random.choices(string.ascii_letters, k=12)),
+                round(random.uniform(0, 100), 2),
+                random.choice(["alpha", "beta", "gamma", "delta"])
+            ])
+
+
+def upload(url, path, db_name, engine):
+    with open(path, 'rb') as f:
+        response = requests.post(
+            f"{url}/api/upload-mysql",
+            data={"db_name": db_name, "engine": engine, "async": "false"},
+            files={"files": (os.path.basename(path), f, "text/csv")},
+            timeout=3600
+        )
+    response.raise_for_status()
+    return response.json()["results"][0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--file", action="append", default=[], help="CSV file to upload (repeatable)")
+    parser.add_argument("--synthetic-rows", type=int, default=0, help="Also upload a generated CSV with this many rows")
+    parser.add_argument("--engines", default="insert,load_data")
+    args = parser.parse_args()
+
+    files = list(args.file) or ["country/city.csv"]
+    tmp_dir = tempfile.mkdtemp()
+    if args.synthetic_rows:
+        path = os.path.join(tmp_dir, "synthetic.csv")
+        write_synthetic_csv(path, args.synthetic_rows)
+        files.append(path)
+
+    print(f"{'file':<20} {'engine':<10} {'rows':>10} {'seconds':>9} {'rows/sec':>12}")
+    for path in files:
+        for engine in args.engines.split(","):
+            result = upload(args.url, path, f"bench_{engine}", engine)
+            if result["status"] != "success":
+                print(f"{os.path.basename(path):<20} {engine:<10} error: {result['message']}")
+                continue
+            label = result["engine"] if result["engine"] == engine else f"{engine}->{result['engine']}"
+            print(f"{os.path.basename(path):<20} {label:<10} {result['rows_inserted']:>10} "
+                  f"{result['seconds']:>9} {result['rows_per_sec']:>12}")
+
+
+if __name__ == "__main__":
+    main()
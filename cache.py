@@ -0,0 +1,422 @@
+import hashlib
+import json
+import os
+import pickle
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from bson import json_util
+
+
+class SchemaCache:
+    """
+    In-process schema cache keyed by (backend, db_name).
+
+    Every key has a version counter that upload routes bump through
+    ``invalidate``; an entry is only served while its version is current and its
+    TTL has not expired. When ``shared_dir`` is set, each bump also writes a
+    fresh token to ``<shared_dir>/<backend>-<db_name>.version`` so that other
+    worker processes drop their copy on their next lookup.
+
+    Args:
+        ttl (float): Seconds an entry may be served before it is reloaded
+        shared_dir (str): Optional directory used for cross-worker invalidation
+    """
+
+    def __init__(self, ttl=300, shared_dir=None):
+        self.ttl = ttl
+        self.shared_dir = shared_dir
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._versions = {}
+        self._hits = 0
+        self._misses = 0
+        if shared_dir:
+            os.makedirs(shared_dir, exist_ok=True)
+
+    def _token_path(self, key):
+        backend, db_name = key
+        return os.path.join(self.shared_dir, re.sub(r'[^\w.-]', '_', f"{backend}-{db_name}") + ".version")
+
+    def _shared_token(self, key):
+        if not self.shared_dir:
+            return None
+        try:
+            with open(self._token_path(key)) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def version(self, backend, db_name):
+        with self._lock:
+            return self._versions.get((backend, db_name), 0)
+
+    def get(self, backend, db_name, loader):
+        """
+        Return the cached schema, calling ``loader()`` only on a miss.
+
+        Args:
+            backend (str): "mysql" or "mongodb"
+            db_name (str): Database name
+            loader (callable): Loads the schema from the backend
+
+        Returns:
+            dict: Schema for the database
+        """
+        key = (backend, db_name)
+        token = self._shared_token(key)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            version = self._versions.get(key, 0)
+            if entry is not None:
+                schema, entry_version, entry_token, expires_at = entry
+                if entry_version == version and entry_token == token and now < expires_at:
+                    self._hits += 1
+                    return schema
+            self._misses += 1
+
+        schema = loader()
+
+        with self._lock:
+            # An upload that finished while we were loading has already bumped
+            # the version; storing under the old one lets the next call reload.
+            self._entries[key] = (schema, version, token, time.monotonic() + self.ttl)
+        return schema
+
+    def invalidate(self, backend, db_name):
+        key = (backend, db_name)
+        with self._lock:
+            self._versions[key] = self._versions.get(key, 0) + 1
+            self._entries.pop(key, None)
+        if self.shared_dir:
+            path = self._token_path(key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as f:
+                f.write(uuid.uuid4().hex)
+            os.replace(tmp_path, path)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "ttl": self.ttl,
+                "shared": bool(self.shared_dir),
+            }
+
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def normalize_prompt(prompt):
+    """
+    Collapse runs of whitespace and trim ``prompt``.
+
+    Case is kept because quoted values in the question end up as literals in
+    the query, and MongoDB compares strings case-sensitively.
+    """
+    return WHITESPACE_PATTERN.sub(' ', prompt).strip()
+
+
+def schema_fingerprint(schema):
+    """
+    Digest of a schema dict; any change to tables, columns or types changes it.
+
+    Order counts too: rule-based translation resolves a column to the first
+    table listing it.
+    """
+    encoded = json.dumps(schema, separators=(',', ':'), default=str)
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+
+class TranslationCache:
+    """
+    Bounded LRU cache of natural-language -> query translations.
+
+    Keys are built by ``key`` from the normalised prompt, a fingerprint of the
+    schema the translation was made against, the target backend and the
+    translator option. Reloading a schema after an upload therefore yields new
+    keys, and translations made against the old schema simply age out of the
+    LRU. Entries also expire after ``ttl`` seconds. ``max_entries=0`` disables
+    the cache.
+
+    Args:
+        max_entries (int): Entries kept before the least recently used is evicted
+        ttl (float): Seconds an entry may be served
+    """
+
+    def __init__(self, max_entries=1024, ttl=3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @staticmethod
+    def key(prompt, schema, backend, option):
+        return (normalize_prompt(prompt), schema_fingerprint(schema), backend, option)
+
+    def get(self, key, translate):
+        """
+        Return the cached translation for ``key``, calling ``translate()`` only on a miss.
+
+        Exceptions from ``translate`` propagate and an empty result (``None``,
+        or ``''`` from the LLM) is returned without being stored, so a failed
+        translation is retried on the next request.
+        """
+        if self.max_entries <= 0:
+            return translate()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if now < expires_at:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return value
+                del self._entries[key]
+            self._misses += 1
+
+        value = translate()
+        if not value:
+            return value
+
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+        return value
+
+    def discard(self, key):
+        """Drop one translation, e.g. after the query it produced failed to run."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "ttl": self.ttl,
+            }
+
+
+SQL_TABLE_PATTERN = re.compile(r"\b(?:FROM|JOIN)\s+`?(\w+)`?", re.IGNORECASE)
+SQL_QUOTED_PATTERN = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`")
+# Results that depend on more than the stored rows are never cached.
+VOLATILE_SQL_PATTERN = re.compile(
+    r"\b(?:NOW|SYSDATE|CURDATE|CURTIME|CURRENT_DATE|CURRENT_TIME|CURRENT_TIMESTAMP|LOCALTIME|"
+    r"LOCALTIMESTAMP|UNIX_TIMESTAMP|UTC_DATE|UTC_TIME|UTC_TIMESTAMP|RAND|UUID|UUID_SHORT|"
+    r"CONNECTION_ID|LAST_INSERT_ID|FOUND_ROWS|USER|CURRENT_USER|DATABASE|SLEEP)\b",
+    re.IGNORECASE
+)
+VOLATILE_PIPELINE_KEYS = {"$sample", "$rand", "$out", "$merge", "$currentOp", "$collStats", "$indexStats"}
+
+
+def normalize_sql(sql):
+    """Collapse whitespace outside quoted text and drop the trailing semicolon."""
+    parts = []
+    position = 0
+    for match in SQL_QUOTED_PATTERN.finditer(sql):
+        parts.append(WHITESPACE_PATTERN.sub(' ', sql[position:match.start()]))
+        parts.append(match.group())
+        position = match.end()
+    parts.append(WHITESPACE_PATTERN.sub(' ', sql[position:]))
+    return ''.join(parts).strip().rstrip(';').rstrip()
+
+
+def sql_result_key(sql):
+    """
+    Result-cache identity and tables of a SQL query.
+
+    Returns:
+        tuple: (normalised SQL, frozenset of tables), or None if the query is
+        not a SELECT or uses a volatile function such as NOW() or RAND()
+    """
+    normalized = normalize_sql(sql)
+    unquoted = SQL_QUOTED_PATTERN.sub("''", normalized)
+    if not unquoted[:6].upper() == "SELECT" or VOLATILE_SQL_PATTERN.search(unquoted):
+        return None
+    return normalized, frozenset(SQL_TABLE_PATTERN.findall(normalized))
+
+
+def pipeline_collections(collection, pipeline):
+    """Every collection an aggregation reads: its own plus $lookup/$graphLookup/$unionWith sources."""
+    collections = {collection}
+    pending = [pipeline]
+    while pending:
+        value = pending.pop()
+        if isinstance(value, dict):
+            for key, item in value.items():
+                if key in ("$lookup", "$graphLookup") and isinstance(item, dict) and isinstance(item.get("from"), str):
+                    collections.add(item["from"])
+                elif key == "$unionWith":
+                    source = item.get("coll") if isinstance(item, dict) else item
+                    if isinstance(source, str):
+                        collections.add(source)
+                if key in VOLATILE_PIPELINE_KEYS or item == "$$NOW":
+                    return None
+                pending.append(item)
+        elif isinstance(value, list):
+            pending.extend(value)
+        elif value == "$$NOW":
+            return None
+    return collections
+
+
+def pipeline_result_key(collection, pipeline):
+    """
+    Result-cache identity and collections of an aggregation.
+
+    The pipeline is serialised with extended JSON, which keeps key order (it
+    matters to $sort) and tells ObjectIds and dates apart from strings.
+
+    Returns:
+        tuple: (canonical JSON, frozenset of collections), or None for
+        pipelines that use $sample, $rand, $$NOW or write with $out/$merge
+    """
+    collections = pipeline_collections(collection, pipeline)
+    if collections is None:
+        return None
+    return json_util.dumps([collection, pipeline]), frozenset(collections)
+
+
+class ResultCache:
+    """
+    Opt-in, byte-budgeted LRU cache of query results.
+
+    Results are pickled, and the pickle size is charged against ``max_bytes``.
+    Least recently used entries are evicted until the total fits, and results
+    larger than ``max_entry_bytes`` are not stored. Each entry is tagged with
+    the tables or collections it read. Upload routes call ``invalidate`` for
+    the tables they wrote, which drops only the affected entries. A result
+    computed while such an upload finished is not stored. Other worker
+    processes do not see the invalidation, so ``ttl`` bounds how long they may
+    serve older rows. ``max_bytes=0`` disables the cache.
+
+    Args:
+        max_bytes (int): Memory budget for pickled results
+        ttl (float): Seconds a result may be served
+        max_entry_bytes (int): Largest single result kept; defaults to a quarter of the budget
+    """
+
+    def __init__(self, max_bytes=0, ttl=60, max_entry_bytes=None):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_entry_bytes = max_entry_bytes if max_entry_bytes is not None else max_bytes // 4
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _drop(self, key):
+        payload, _, _ = self._entries.pop(key)
+        self._bytes -= len(payload)
+
+    def get(self, backend, db_name, identity, run):
+        """
+        Return cached results for a query, calling ``run()`` only on a miss.
+
+        Args:
+            backend (str): "mysql" or "mongodb"
+            db_name (str): Database name
+            identity (tuple): (canonical query, tables) from ``sql_result_key``
+                or ``pipeline_result_key``; None runs the query uncached
+            run (callable): Executes the query and returns its results
+
+        Returns:
+            tuple: (results, served from cache)
+        """
+        if not self.enabled or identity is None:
+            return run(), False
+        query, tables = identity
+        tables = frozenset(table.lower() for table in tables)
+        key = (backend, db_name, query)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                payload, _, expires_at = entry
+                if now < expires_at:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return pickle.loads(payload), True
+                self._drop(key)
+            self._misses += 1
+            generation = self._generations.get((backend, db_name), 0)
+
+        results = run()
+        payload = pickle.dumps(results, pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self.max_entry_bytes:
+            return results, False
+
+        with self._lock:
+            if self._generations.get((backend, db_name), 0) != generation:
+                return results, False
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (payload, tables, time.monotonic() + self.ttl)
+            self._bytes += len(payload)
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self._evictions += 1
+        return results, False
+
+    def invalidate(self, backend, db_name, tables=None):
+        """Drop results of ``db_name`` that read any of ``tables`` (all of them when None)."""
+        if tables is not None:
+            tables = {table.lower() for table in tables}
+        with self._lock:
+            self._generations[(backend, db_name)] = self._generations.get((backend, db_name), 0) + 1
+            stale = [
+                key for key, (_, entry_tables, _) in self._entries.items()
+                if key[0] == backend and key[1] == db_name and (tables is None or entry_tables & tables)
+            ]
+            for key in stale:
+                self._drop(key)
+            self._invalidations += len(stale)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "ttl": self.ttl,
+            }
@@ -0,0 +1,345 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import pymysql
+from pymysql.constants import SERVER_STATUS
+from pymongo.mongo_client import MongoClient
+from pymongo.server_api import ServerApi
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes available in time."""
+
+
+class _PooledConnection:
+    def __init__(self, connection, key):
+        self.connection = connection
+        self.key = key
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class MySQLPool:
+    """
+    Bounded, thread-safe pool of pymysql connections keyed by database name.
+
+    Connections are created through ``connect(db_name, read_only=...)`` and
+    handed back to the idle list for that database and mode when released. On checkout a connection that
+    has been idle longer than ``ping_after`` seconds is pinged first; idle
+    connections older than ``idle_timeout`` and any connection older than
+    ``max_lifetime`` are closed instead of being reused.
+
+    Args:
+        connect (callable): Factory returning a new connection for a database name and mode
+        max_size (int): Maximum number of open connections across all databases
+        idle_timeout (float): Seconds an idle connection is kept before eviction
+        max_lifetime (float): Seconds after which a connection is recycled
+        checkout_timeout (float): Seconds to wait for a free slot before failing
+        ping_after (float): Idle seconds after which a checkout health check runs
+    """
+
+    def __init__(self, connect, max_size=10, idle_timeout=300, max_lifetime=1800,
+                 checkout_timeout=10, ping_after=30):
+        self._connect = connect
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.checkout_timeout = checkout_timeout
+        self.ping_after = ping_after
+
+        self._cond = threading.Condition()
+        self._idle = {}
+        self._in_use = 0
+        self._open = 0
+        self._waiters = 0
+        self._pid = os.getpid()
+
+        self._checkouts = 0
+        self._checkout_time = 0.0
+        self._checkout_time_max = 0.0
+        self._created = 0
+        self._recycled = 0
+        self._evicted = 0
+        self._failed_checks = 0
+
+    def _reset_after_fork(self):
+        # Sockets inherited from the parent process must not be shared, so a
+        # forked worker simply forgets them and starts with an empty pool.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._idle = {}
+            self._in_use = 0
+            self._open = 0
+            self._waiters = 0
+
+    def _close(self, entry):
+        self._open -= 1
+        try:
+            entry.connection.close()
+        except Exception:
+            pass
+
+    def _expired(self, entry, now):
+        return now - entry.created_at > self.max_lifetime
+
+    def _evict_idle(self, now):
+        for key in list(self._idle):
+            keep = []
+            for entry in self._idle[key]:
+                if now - entry.last_used > self.idle_timeout:
+                    self._evicted += 1
+                    self._close(entry)
+                elif self._expired(entry, now):
+                    self._recycled += 1
+                    self._close(entry)
+                else:
+                    keep.append(entry)
+            if keep:
+                self._idle[key] = keep
+            else:
+                del self._idle[key]
+
+    def _steal_idle_slot(self):
+        # Free room for a new database by closing the least recently used idle
+        # connection that belongs to some other database.
+        oldest = None
+        for entries in self._idle.values():
+            for entry in entries:
+                if oldest is None or entry.last_used < oldest.last_used:
+                    oldest = entry
+        if oldest is None:
+            return False
+        self._idle[oldest.key].remove(oldest)
+        if not self._idle[oldest.key]:
+            del self._idle[oldest.key]
+        self._evicted += 1
+        self._close(oldest)
+        return True
+
+    def _healthy(self, entry):
+        if time.monotonic() - entry.last_used <= self.ping_after:
+            return True
+        try:
+            entry.connection.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def acquire(self, db_name=None, read_only=False):
+        key = (db_name, read_only)
+        start = time.monotonic()
+        deadline = start + self.checkout_timeout
+        while True:
+            entry = None
+            with self._cond:
+                self._reset_after_fork()
+                while True:
+                    now = time.monotonic()
+                    self._evict_idle(now)
+
+                    idle = self._idle.get(key)
+                    if idle:
+                        entry = idle.pop()
+                        if not idle:
+                            del self._idle[key]
+                        self._in_use += 1
+                        break
+
+                    if self._open < self.max_size or self._steal_idle_slot():
+                        self._open += 1
+                        self._in_use += 1
+                        break
+
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        raise PoolTimeoutError(
+                            f"Timed out after {self.checkout_timeout}s waiting for a MySQL connection"
+                        )
+                    self._waiters += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiters -= 1
+
+            # Health checks and handshakes run outside the lock so a slow
+            # server does not block every other borrower.
+            if entry is not None:
+                if self._healthy(entry):
+                    break
+                with self._cond:
+                    self._failed_checks += 1
+                    self._in_use -= 1
+                    self._close(entry)
+                    self._cond.notify()
+                continue
+
+            try:
+                entry = _PooledConnection(self._connect(db_name, read_only=read_only), key)
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._in_use -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._created += 1
+            break
+
+        elapsed = time.monotonic() - start
+        with self._cond:
+            self._checkouts += 1
+            self._checkout_time += elapsed
+            self._checkout_time_max = max(self._checkout_time_max, elapsed)
+        return entry
+
+    def release(self, entry, discard=False):
+        if not discard:
+            try:
+                # Drop any transaction a failed caller left open so the next
+                # borrower starts from a clean session.
+                if entry.connection.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+                    entry.connection.rollback()
+            except Exception:
+                discard = True
+        with self._cond:
+            if self._pid != os.getpid():
+                return
+            self._in_use -= 1
+            now = time.monotonic()
+            if not discard and self._expired(entry, now):
+                self._recycled += 1
+                discard = True
+            if discard:
+                self._close(entry)
+            else:
+                entry.last_used = now
+                self._idle.setdefault(entry.key, []).append(entry)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, db_name=None, read_only=False):
+        """Borrow a connection for ``db_name`` and return it to the pool afterwards."""
+        entry = self.acquire(db_name, read_only=read_only)
+        discard = False
+        try:
+            yield entry.connection
+        except Exception as e:
+            # Broken sockets are not worth keeping; query errors are.
+            discard = isinstance(e, (pymysql.err.OperationalError, pymysql.err.InterfaceError)) or not entry.connection.open
+            raise
+        finally:
+            self.release(entry, discard=discard)
+
+    def close_all(self):
+        with self._cond:
+            for entries in self._idle.values():
+                for entry in entries:
+                    self._close(entry)
+            self._idle = {}
+
+    def stats(self):
+        with self._cond:
+            idle = sum(len(entries) for entries in self._idle.values())
+            return {
+                "size": self._open,
+                "max_size": self.max_size,
+                "in_use": self._in_use,
+                "idle": idle,
+                "idle_by_database": {
+                    f"{db_name}{' (read-only)' if read_only else ''}": len(entries)
+                    for (db_name, read_only), entries in self._idle.items()
+                },
+                "waiters": self._waiters,
+                "checkouts": self._checkouts,
+                "checkout_ms_avg": round(1000 * self._checkout_time / self._checkouts, 3) if self._checkouts else 0.0,
+                "checkout_ms_max": round(1000 * self._checkout_time_max, 3),
+                "created": self._created,
+                "recycled": self._recycled,
+                "evicted": self._evicted,
+                "failed_health_checks": self._failed_checks,
+            }
+
+
+_mongo_lock = threading.Lock()
+_mongo_client = None
+_mongo_pid = None
+_mongo_health = {}
+
+
+def _mongo_health_loop(client, interval):
+    # One background ping per interval replaces the per-request ping; PyMongo's
+    # own monitors keep server selection up to date in between.
+    while _mongo_client is client and _mongo_pid == os.getpid():
+        start = time.monotonic()
+        try:
+            client.admin.command('ping')
+            _mongo_health.update({
+                "healthy": True,
+                "last_ping_ms": round(1000 * (time.monotonic() - start), 3),
+                "last_error": None,
+            })
+        except Exception as e:
+            _mongo_health["healthy"] = False
+            _mongo_health["failures"] = _mongo_health.get("failures", 0) + 1
+            _mongo_health["last_error"] = str(e)
+            print(f"MongoDB health check failed: {e}")
+        _mongo_health["last_checked"] = time.time()
+        time.sleep(interval)
+
+
+def get_mongo_client():
+    """
+    Return the process-wide MongoClient, creating it on first use.
+
+    The client is rebuilt after a fork (e.g. gunicorn workers with preload)
+    because PyMongo clients must not be shared across processes.
+
+    Returns:
+        MongoClient: Shared client for this process
+    """
+    global _mongo_client, _mongo_pid
+    pid = os.getpid()
+    if _mongo_client is not None and _mongo_pid == pid:
+        return _mongo_client
+
+    with _mongo_lock:
+        if _mongo_client is None or _mongo_pid != pid:
+            uri = os.getenv('MONGODB_URI')
+            client = MongoClient(
+                uri,
+                server_api=ServerApi('1'),
+                maxPoolSize=int(os.getenv('MONGODB_MAX_POOL_SIZE', '50')),
+                minPoolSize=int(os.getenv('MONGODB_MIN_POOL_SIZE', '0')),
+                maxIdleTimeMS=int(os.getenv('MONGODB_MAX_IDLE_TIME_MS', '300000')),
+                serverSelectionTimeoutMS=int(os.getenv('MONGODB_SERVER_SELECTION_TIMEOUT_MS', '10000')),
+                connect=False
+            )
+            _mongo_client = client
+            _mongo_pid = pid
+            _mongo_health.clear()
+            _mongo_health.update({"healthy": None, "failures": 0, "created": time.time()})
+
+            interval = float(os.getenv('MONGODB_HEALTH_INTERVAL', '30'))
+            threading.Thread(
+                target=_mongo_health_loop,
+                args=(client, interval),
+                name="mongodb-health",
+                daemon=True
+            ).start()
+            print("MongoDB client created")
+    return _mongo_client
+
+
+def get_mongo_db(db_name):
+    return get_mongo_client()[db_name]
+
+
+def mongo_stats():
+    if _mongo_client is None or _mongo_pid != os.getpid():
+        return {"connected": False}
+    stats = {"connected": True}
+    stats.update(_mongo_health)
+    stats["max_pool_size"] = _mongo_client.options.pool_options.max_pool_size
+    return stats
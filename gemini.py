@@ -1,12 +1,14 @@
-
 import google.generativeai as genai
 import json
 import os
-from copy import deepcopy
-class QueryER:
-    def __init__(self,model_name: str = "gemini-1.5-flash"):
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from google.api_core import exceptions as google_exceptions
 
-        self.content_sql = """
+SQL_PROMPT = """
         You are is SQL expert and you have to write sql query for the given prompt and the dataschema
             ### Task:
             - Use the query and schema to write a SQL query
@@ -81,8 +83,8 @@ class QueryER:
 
             MySql Query:
         """
-        
-        self.content_mongodb ="""
+
+MONGODB_PROMPT = """
                 You are is MongoDB expert and you have to write mongodb query for the given prompt and the dataschema
             ### Task:
             - Use the query and schema to write a mongodb query
@@ -150,43 +152,328 @@ class QueryER:
 
             MongoDB Query:
         """
-        
+
+
+# Errors worth retrying: the model is slow, overloaded or rate limiting.
+# Anything else (bad key, bad request) fails the call straight away.
+RETRYABLE_ERRORS = (
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.ResourceExhausted,
+    google_exceptions.InternalServerError,
+    google_exceptions.TooManyRequests,
+    TimeoutError,
+    ConnectionError,
+)
+TIMEOUT_ERRORS = (google_exceptions.DeadlineExceeded, TimeoutError)
+# A call is not started with less than this many seconds of budget left.
+MIN_CALL_SECONDS = 1.0
+
+
+class LLMUnavailableError(RuntimeError):
+    """Raised when the model cannot answer in time: retries or budget exhausted, or the circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Fails fast once the model keeps failing.
+
+    After ``failure_threshold`` consecutive failed calls the circuit opens and
+    calls are rejected for ``reset_timeout`` seconds. Then a single trial call
+    is let through (half-open): success closes the circuit, failure opens it
+    again.
+
+    Args:
+        failure_threshold (int): Consecutive failures that open the circuit
+        reset_timeout (float): Seconds the circuit stays open
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._opened = 0
+        self._rejected = 0
+
+    def state(self):
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now):
+        if self._opened_at is None:
+            return "closed"
+        if now - self._opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def allow(self):
+        """Return True if a call may be made now."""
+        with self._lock:
+            state = self._state(time.monotonic())
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            self._rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._trial_running:
+                    self._opened += 1
+                self._opened_at = time.monotonic()
+                self._trial_running = False
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self._state(time.monotonic()),
+                "consecutive_failures": self._failures,
+                "opened": self._opened,
+                "rejected": self._rejected,
+            }
+
+
+_deadline = threading.local()
+
+
+@contextmanager
+def llm_deadline(seconds):
+    """
+    Bound the time all LLM calls made by this thread inside the block may take.
+
+    Wrap a whole request in it, so retries at every level (decompose, the
+    routes' parse retries) share one budget. Nested blocks keep the earlier
+    deadline.
+    """
+    previous = getattr(_deadline, "at", None)
+    deadline = time.monotonic() + seconds
+    _deadline.at = deadline if previous is None else min(previous, deadline)
+    try:
+        yield
+    finally:
+        _deadline.at = previous
+
+
+_genai_lock = threading.Lock()
+_genai_pid = None
+_translators_lock = threading.Lock()
+_translators = {}
+_translators_pid = None
+
+
+def configure_genai():
+    """Configure the generative.ai client once per process (again after a fork)."""
+    global _genai_pid
+    pid = os.getpid()
+    if _genai_pid == pid:
+        return
+    with _genai_lock:
+        if _genai_pid != pid:
+            genai.configure(api_key=os.getenv("API_KEY"))
+            _genai_pid = pid
+
+
+class QueryER:
+    """
+    Translates questions with Gemini.
+
+    Each model call gets ``timeout`` seconds. Failed or empty answers are
+    retried up to ``max_attempts`` calls in total, with full-jitter exponential
+    backoff between calls, as long as the budget allows: ``budget`` seconds
+    per decompose call, or less inside ``llm_deadline``. A ``CircuitBreaker``
+    makes calls fail fast with LLMUnavailableError while the model keeps
+    failing, so callers can fall back to the rule-based translator.
+
+    Defaults come from the LLM_* environment variables.
+    """
+
+    def __init__(self,model_name: str = "gemini-1.5-flash", timeout=None, max_attempts=None, budget=None,
+                 backoff_base=None, backoff_max=None, breaker=None):
+
+        self.content_sql = SQL_PROMPT
+        self.content_mongodb = MONGODB_PROMPT
         self.model_name = model_name
+        self.timeout = timeout or float(os.getenv("LLM_TIMEOUT", "20"))
+        self.max_attempts = max_attempts or int(os.getenv("LLM_MAX_ATTEMPTS", "5"))
+        self.budget = budget or float(os.getenv("LLM_BUDGET", "45"))
+        self.backoff_base = backoff_base or float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+        self.backoff_max = backoff_max or float(os.getenv("LLM_BACKOFF_MAX", "8"))
+        self.breaker = breaker or CircuitBreaker(
+            failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+            reset_timeout=float(os.getenv("LLM_BREAKER_RESET", "30"))
+        )
+        self._stats_lock = threading.Lock()
+        self._counters = dict.fromkeys(
+            ("requests", "calls", "retries", "timeouts", "errors", "empty_responses", "budget_exhausted",
+             "circuit_rejections"), 0
+        )
+        self._call_time = 0.0
+        self._call_time_max = 0.0
+        self._request_time = 0.0
+        self._request_time_max = 0.0
 
         # Configure generative.ai with your API key (replace with yours)
-        genai.configure(api_key=os.getenv("API_KEY"))
+        configure_genai()
         # Load the Gemini model using generative.ai
         self.model = genai.GenerativeModel(model_name=self.model_name)
 
+    def _count(self, name):
+        with self._stats_lock:
+            self._counters[name] += 1
+
+    def _generate(self, full_prompt, timeout):
+        """One model call; returns its text ('' when the answer was blocked), timing it either way."""
+        start = time.monotonic()
+        try:
+            response = self.model.generate_content(full_prompt, request_options={"timeout": timeout})
+        finally:
+            elapsed = time.monotonic() - start
+            with self._stats_lock:
+                self._counters["calls"] += 1
+                self._call_time += elapsed
+                self._call_time_max = max(self._call_time_max, elapsed)
+        try:
+            return response.text
+        except ValueError:
+            # Blocked or empty candidates have no text.
+            return ''
+
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
     def decompose(self, input_prompt: str, dataschema,database:str) -> str:
-        full_prompt = deepcopy(self.content_sql) if database == "sql" else deepcopy(self.content_mongodb)
+        """
+        Return the query the model writes for ``input_prompt``, or '' if every answer was unusable.
+
+        Raises:
+            LLMUnavailableError: If the circuit is open, or calls kept failing until
+                the attempts or the time budget ran out
+        """
+        full_prompt = self.content_sql if database == "sql" else self.content_mongodb
         full_prompt = full_prompt.replace('<input>', input_prompt)
         full_prompt = full_prompt.replace('<schema>', dataschema)
-        query=''
-        retries = 5
 
-        while len(query) == 0 and retries:
-            retries -= 1
+        start = time.monotonic()
+        deadline = start + self.budget
+        request_deadline = getattr(_deadline, "at", None)
+        if request_deadline is not None:
+            deadline = min(deadline, request_deadline)
+        self._count("requests")
+        try:
+            return self._decompose(full_prompt, database, deadline)
+        finally:
+            elapsed = time.monotonic() - start
+            with self._stats_lock:
+                self._request_time += elapsed
+                self._request_time_max = max(self._request_time_max, elapsed)
+
+    def _decompose(self, full_prompt, database, deadline):
+        query=''
+        last_error = None
+
+        for attempt in range(self.max_attempts):
+            if attempt:
+                self._count("retries")
+                delay = self._backoff(attempt - 1)
+                if time.monotonic() + delay + MIN_CALL_SECONDS > deadline:
+                    self._count("budget_exhausted")
+                    break
+                time.sleep(delay)
+
+            remaining = deadline - time.monotonic()
+            if remaining < MIN_CALL_SECONDS:
+                self._count("budget_exhausted")
+                break
+            if not self.breaker.allow():
+                self._count("circuit_rejections")
+                raise LLMUnavailableError(f"{self.model_name} is unavailable (circuit open).")
+
+            try:
+                sequence = self._generate(full_prompt, min(self.timeout, remaining))
+            except Exception as e:
+                self.breaker.record_failure()
+                self._count("timeouts" if isinstance(e, TIMEOUT_ERRORS) else "errors")
+                if not isinstance(e, RETRYABLE_ERRORS):
+                    raise
+                last_error = e
+                continue
+            self.breaker.record_success()
+            last_error = None
 
-            response = self.model.generate_content(full_prompt)
-            # import pdb; pdb.set_trace()
-            # Access the generated text
-            sequence = response.text
-            
             start_idx, end_idx = sequence.find('{'), sequence.rfind('}')
             if start_idx != -1 and end_idx != -1:
                 json_str = sequence[start_idx:end_idx + 1]
                 try:
                     data = json.loads(json_str)
                     query = data["sql"] if database == "sql" else data["mongodb"]
-                except json.JSONDecodeError:
+                except (json.JSONDecodeError, KeyError, TypeError):
                     query=''
+            if query:
+                return query
+            self._count("empty_responses")
 
-            else:
-                continue
-
-
+        if last_error is not None:
+            raise LLMUnavailableError(f"{self.model_name} did not answer: {last_error}") from last_error
         return query
+
+    def stats(self):
+        with self._stats_lock:
+            calls = self._counters["calls"]
+            requests = self._counters["requests"]
+            stats = dict(self._counters)
+            stats.update({
+                "call_ms_avg": round(1000 * self._call_time / calls, 3) if calls else 0.0,
+                "call_ms_max": round(1000 * self._call_time_max, 3),
+                "request_ms_avg": round(1000 * self._request_time / requests, 3) if requests else 0.0,
+                "request_ms_max": round(1000 * self._request_time_max, 3),
+            })
+        stats["circuit"] = self.breaker.stats()
+        return stats
+
+
+def get_query_translator(model_name: str = "gemini-1.5-flash") -> QueryER:
+    """
+    Return the process-wide QueryER for ``model_name``, creating it on first use.
+
+    Instances only hold the prompt templates and the model handle, so one per
+    model is shared by all request threads. The registry is rebuilt after a
+    fork (e.g. gunicorn workers with preload) so workers never share a client.
+
+    Returns:
+        QueryER: Shared translator for this process
+    """
+    global _translators, _translators_pid
+    pid = os.getpid()
+    if _translators_pid == pid and model_name in _translators:
+        return _translators[model_name]
+
+    with _translators_lock:
+        if _translators_pid != pid:
+            _translators = {}
+            _translators_pid = pid
+        if model_name not in _translators:
+            _translators[model_name] = QueryER(model_name)
+        return _translators[model_name]
+
+
+def translator_stats():
+    """Retry, latency and circuit metrics of the translators this process has created, by model."""
+    with _translators_lock:
+        translators = dict(_translators) if _translators_pid == os.getpid() else {}
+    return {model_name: translator.stats() for model_name, translator in translators.items()}
         
 
 
@@ -0,0 +1,398 @@
+import itertools
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+import pymysql
+from pymongo.errors import BulkWriteError
+
+
+UPLOAD_CHUNK_ROWS = int(os.getenv('UPLOAD_CHUNK_ROWS', '5000'))
+UPLOAD_COMMIT_ROWS = int(os.getenv('UPLOAD_COMMIT_ROWS', '50000'))
+# Rows read before the table is created, so column types do not hinge on the first chunk.
+UPLOAD_TYPE_SAMPLE_ROWS = int(os.getenv('UPLOAD_TYPE_SAMPLE_ROWS', '20000'))
+# Files at least this large use LOAD DATA LOCAL INFILE when the engine is "auto".
+UPLOAD_LOAD_DATA_THRESHOLD = int(os.getenv('UPLOAD_LOAD_DATA_THRESHOLD', str(8 * 1024 * 1024)))
+
+UPLOAD_ENGINES = ("auto", "insert", "load_data")
+
+MONGO_BATCH_SIZE = int(os.getenv('MONGO_BATCH_SIZE', '1000'))
+# Batches of one file that may be waiting on the server at the same time.
+MONGO_INFLIGHT_BATCHES = int(os.getenv('MONGO_INFLIGHT_BATCHES', '4'))
+# Write errors kept per file; the rest are only counted.
+MONGO_MAX_REPORTED_ERRORS = 20
+
+# Server or client refused LOCAL INFILE: 1148 not allowed, 3948 disabled,
+# 2068 rejected by the client library.
+LOCAL_INFILE_DISABLED_CODES = {1148, 3948, 2068}
+
+
+class IngestError(Exception):
+    """Raised when a file fails part-way; ``rows_committed`` rows are already stored."""
+
+    def __init__(self, message, rows_committed=0):
+        super().__init__(message)
+        self.rows_committed = rows_committed
+
+
+def read_csv_chunks(stream, chunksize=UPLOAD_CHUNK_ROWS):
+    """
+    Iterate over a binary CSV stream in DataFrame chunks.
+
+    pandas decodes the stream incrementally, so neither the raw bytes nor the
+    decoded text of the whole file are ever held in memory.
+    """
+    return pd.read_csv(stream, encoding='utf-8', chunksize=chunksize)
+
+
+# Column types from narrowest to widest; a later value never needs a narrower one.
+MYSQL_TYPE_ORDER = ('INT', 'FLOAT', 'VARCHAR(255)', 'TEXT')
+# Type given to columns that only held nulls when the table was created, as
+# pandas reads an all-NaN column as float64.
+MYSQL_NULL_COLUMN_TYPE = 'FLOAT'
+
+
+def mysql_column_type(dtype):
+    if dtype == 'int64':
+        return 'INT'
+    elif dtype == 'float64':
+        return 'FLOAT'
+    return 'VARCHAR(255)'
+
+
+def infer_column_types(df):
+    """
+    Return column -> MySQL type for the values in ``df``.
+
+    Columns without any value are None, since they say nothing about the
+    type, and text longer than 255 characters needs TEXT.
+    """
+    types = {}
+    for column, dtype in df.dtypes.items():
+        values = df[column].dropna()
+        if values.empty:
+            types[column] = None
+        elif dtype == 'object' and values.astype(str).str.len().max() > 255:
+            types[column] = 'TEXT'
+        else:
+            types[column] = mysql_column_type(dtype)
+    return types
+
+
+def wider_type(current, new):
+    """The narrowest of MYSQL_TYPE_ORDER that holds values of both types (None counts as no values)."""
+    if current is None or new is None:
+        return current or new
+    return max(current, new, key=MYSQL_TYPE_ORDER.index)
+
+
+def mysql_create_table_sql(table_name, column_types):
+    columns = [f"`{column}` {sql_type or MYSQL_NULL_COLUMN_TYPE}" for column, sql_type in column_types.items()]
+    return f"CREATE TABLE IF NOT EXISTS `{table_name}` ({', '.join(columns)})"
+
+
+def mysql_widen_columns_sql(table_name, column_types):
+    changes = [f"MODIFY `{column}` {sql_type}" for column, sql_type in column_types.items()]
+    return f"ALTER TABLE `{table_name}` {', '.join(changes)}"
+
+
+def mysql_insert_sql(table_name, columns):
+    placeholders = ', '.join(['%s'] * len(columns))
+    return f"INSERT INTO `{table_name}` ({', '.join([f'`{col}`' for col in columns])}) VALUES ({placeholders})"
+
+
+def chunk_rows(chunk):
+    # object dtype turns numpy scalars into plain Python values the driver can
+    # escape, and missing cells become NULL instead of the string 'nan'.
+    return chunk.astype(object).where(chunk.notna(), None).values.tolist()
+
+
+def stream_position(stream):
+    try:
+        return stream.tell()
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def insert_csv_mysql(connection, table_name, stream, chunksize=UPLOAD_CHUNK_ROWS, commit_rows=UPLOAD_COMMIT_ROWS,
+                     progress=None, sample_rows=UPLOAD_TYPE_SAMPLE_ROWS):
+    """
+    Stream a CSV into ``table_name`` in bounded batches.
+
+    The table is created with the column types of the first ``sample_rows``
+    rows. Should a later chunk hold values those types cannot store (text in
+    a numeric column, numbers in a column that was empty so far, long text),
+    the columns are widened with ALTER TABLE before the chunk is inserted.
+    Each chunk is sent as one multi-row INSERT and the transaction is
+    committed every ``commit_rows`` rows, so peak memory depends on
+    ``chunksize`` and ``sample_rows`` rather than on the file size.
+    ``progress(rows, bytes_read)`` is called after every chunk.
+
+    Returns:
+        int: Number of rows inserted
+
+    Raises:
+        IngestError: If a chunk fails; the open transaction is rolled back
+    """
+    rows_committed = 0
+    rows_pending = 0
+    insert_query = None
+    try:
+        with connection.cursor() as cursor:
+            chunks = iter(read_csv_chunks(stream, chunksize))
+            sample = []
+            sampled = 0
+            for chunk in chunks:
+                sample.append(chunk)
+                sampled += len(chunk)
+                if sampled >= sample_rows:
+                    break
+
+            column_types = {}
+            for chunk in itertools.chain(sample, chunks):
+                if insert_query is None:
+                    column_types = infer_column_types(pd.concat(sample))
+                    cursor.execute(mysql_create_table_sql(table_name, column_types))
+                    column_types = {column: sql_type or MYSQL_NULL_COLUMN_TYPE
+                                    for column, sql_type in column_types.items()}
+                    insert_query = mysql_insert_sql(table_name, chunk.columns)
+                    connection.begin()
+
+                widened = {}
+                for column, sql_type in infer_column_types(chunk).items():
+                    if wider_type(column_types[column], sql_type) != column_types[column]:
+                        widened[column] = wider_type(column_types[column], sql_type)
+                if widened:
+                    # ALTER TABLE commits implicitly, so close the open batch first.
+                    connection.commit()
+                    rows_committed += rows_pending
+                    rows_pending = 0
+                    cursor.execute(mysql_widen_columns_sql(table_name, widened))
+                    column_types.update(widened)
+                    connection.begin()
+
+                cursor.executemany(insert_query, chunk_rows(chunk))
+                rows_pending += len(chunk)
+                if progress:
+                    progress(rows_committed + rows_pending, stream_position(stream))
+
+                if rows_pending >= commit_rows:
+                    connection.commit()
+                    rows_committed += rows_pending
+                    rows_pending = 0
+                    connection.begin()
+
+            if insert_query is not None:
+                connection.commit()
+                rows_committed += rows_pending
+        return rows_committed
+    except Exception as e:
+        try:
+            connection.rollback()
+        except Exception:
+            pass
+        raise IngestError(str(e), rows_committed) from e
+
+
+def stream_size(stream):
+    """Return the byte size of a seekable stream without consuming it, else None."""
+    try:
+        position = stream.tell()
+        stream.seek(0, os.SEEK_END)
+        size = stream.tell() - position
+        stream.seek(position)
+        return size
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def choose_mysql_engine(engine, stream):
+    if engine not in UPLOAD_ENGINES:
+        raise ValueError(f"Unknown upload engine '{engine}'. Use one of: {', '.join(UPLOAD_ENGINES)}")
+    if engine != "auto":
+        return engine
+    size = stream_size(stream)
+    return "load_data" if size is not None and size >= UPLOAD_LOAD_DATA_THRESHOLD else "insert"
+
+
+def _line_terminator(path):
+    with open(path, 'rb') as f:
+        first_line = f.readline()
+    return '\r\n' if first_line.endswith(b'\r\n') else '\n'
+
+
+def load_data_csv_mysql(connection, table_name, path, sample_rows=UPLOAD_TYPE_SAMPLE_ROWS):
+    """
+    Bulk-load a CSV file from disk with LOAD DATA LOCAL INFILE.
+
+    Column types come from the first ``sample_rows`` rows. Fields are bound to
+    user variables so empty cells become NULL and CSV columns are matched to
+    table columns by header name.
+
+    Returns:
+        int: Number of rows loaded
+    """
+    sample = pd.read_csv(path, encoding='utf-8', nrows=sample_rows)
+    variables = [f"@c{i}" for i in range(len(sample.columns))]
+    assignments = ', '.join(f"`{column}` = NULLIF({var}, '')" for column, var in zip(sample.columns, variables))
+    load_query = (
+        f"LOAD DATA LOCAL INFILE %s INTO TABLE `{table_name}` "
+        f"CHARACTER SET utf8mb4 "
+        f"FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' "
+        f"LINES TERMINATED BY %s "
+        f"IGNORE 1 LINES ({', '.join(variables)}) SET {assignments}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(mysql_create_table_sql(table_name, infer_column_types(sample)))
+        return cursor.execute(load_query, (path, _line_terminator(path)))
+
+
+def local_path(stream):
+    """Return the filesystem path behind ``stream`` if it is a regular on-disk file."""
+    name = getattr(stream, 'name', None)
+    if isinstance(name, str) and os.path.isfile(name):
+        return name
+    return None
+
+
+def upload_csv_mysql(connection, table_name, stream, engine="auto", progress=None):
+    """
+    Load one uploaded CSV into MySQL with the requested engine.
+
+    "insert" streams batched multi-row INSERTs, "load_data" spools the upload
+    to a temporary file and runs LOAD DATA LOCAL INFILE, and "auto" picks
+    "load_data" for files of at least UPLOAD_LOAD_DATA_THRESHOLD bytes. Streams
+    that are already files on disk are loaded in place instead of spooled.
+    When the server does not allow local infile the file is inserted with
+    batched INSERTs instead.
+
+    Returns:
+        dict: rows_inserted, engine, seconds and rows_per_sec
+
+    Raises:
+        IngestError: If loading fails
+    """
+    engine = choose_mysql_engine(engine, stream)
+    start = time.monotonic()
+    fallback = None
+
+    if engine == "insert":
+        rows = insert_csv_mysql(connection, table_name, stream, progress=progress)
+    else:
+        path = local_path(stream)
+        spooled = path is None
+        if spooled:
+            with tempfile.NamedTemporaryFile(suffix='.csv', delete=False) as spool:
+                shutil.copyfileobj(stream, spool, 1024 * 1024)
+            path = spool.name
+        try:
+            try:
+                rows = load_data_csv_mysql(connection, table_name, path)
+                if progress:
+                    progress(rows, os.path.getsize(path))
+            except pymysql.err.MySQLError as e:
+                if not e.args or e.args[0] not in LOCAL_INFILE_DISABLED_CODES:
+                    raise IngestError(str(e)) from e
+                print(f"LOAD DATA LOCAL INFILE unavailable, falling back to INSERT: {e}")
+                fallback = str(e)
+                engine = "insert"
+                with open(path, 'rb') as f:
+                    rows = insert_csv_mysql(connection, table_name, f, progress=progress)
+            except Exception as e:
+                raise IngestError(str(e)) from e
+        finally:
+            if spooled:
+                os.remove(path)
+
+    seconds = time.monotonic() - start
+    result = {
+        "rows_inserted": rows,
+        "engine": engine,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(rows / seconds, 1) if seconds > 0 else None
+    }
+    if fallback:
+        result["fallback_reason"] = fallback
+    return result
+
+
+def chunk_documents(chunk):
+    # Missing cells become null rather than NaN, matching the NULLs MySQL gets.
+    return chunk.astype(object).where(chunk.notna(), None).to_dict('records')
+
+
+def _insert_batch(collection, documents, offset):
+    """Insert one unordered batch and return (inserted, failed, errors)."""
+    try:
+        result = collection.insert_many(documents, ordered=False)
+        return len(result.inserted_ids), 0, []
+    except BulkWriteError as e:
+        write_errors = e.details.get('writeErrors', [])
+        errors = [
+            {"row": offset + error.get('index', 0), "code": error.get('code'), "message": error.get('errmsg')}
+            for error in write_errors[:MONGO_MAX_REPORTED_ERRORS]
+        ]
+        return e.details.get('nInserted', 0), len(write_errors), errors
+
+
+def insert_csv_mongodb(collection, stream, batch_size=MONGO_BATCH_SIZE, inflight=MONGO_INFLIGHT_BATCHES,
+                       progress=None):
+    """
+    Stream a CSV into a collection with unordered ``insert_many`` batches.
+
+    Each CSV chunk of ``batch_size`` rows is turned into documents only when
+    it is read, and up to ``inflight`` batches are written concurrently, so
+    memory is bounded by ``batch_size * (inflight + 1)`` rows. Duplicate keys
+    and other per-document write errors are collected instead of aborting the
+    file.
+
+    Returns:
+        dict: rows_inserted, rows_failed, write_errors (first few), seconds and rows_per_sec
+
+    Raises:
+        IngestError: If reading the CSV or talking to the server fails
+    """
+    start = time.monotonic()
+    inserted = 0
+    failed = 0
+    errors = []
+    pending = set()
+
+    def collect(done):
+        nonlocal inserted, failed
+        for future in done:
+            batch_inserted, batch_failed, batch_errors = future.result()
+            inserted += batch_inserted
+            failed += batch_failed
+            errors.extend(batch_errors[:MONGO_MAX_REPORTED_ERRORS - len(errors)])
+        if progress:
+            progress(inserted, stream_position(stream))
+
+    try:
+        with ThreadPoolExecutor(max_workers=inflight) as executor:
+            offset = 0
+            for chunk in read_csv_chunks(stream, batch_size):
+                documents = chunk_documents(chunk)
+                if not documents:
+                    continue
+                pending.add(executor.submit(_insert_batch, collection, documents, offset))
+                offset += len(documents)
+                if len(pending) >= inflight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+            done, pending = wait(pending)
+            collect(done)
+    except Exception as e:
+        raise IngestError(str(e), inserted) from e
+
+    seconds = time.monotonic() - start
+    return {
+        "rows_inserted": inserted,
+        "rows_failed": failed,
+        "write_errors": errors,
+        "seconds": round(seconds, 3),
+        "rows_per_sec": round(inserted / seconds, 1) if seconds > 0 else None
+    }
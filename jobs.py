@@ -0,0 +1,214 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from werkzeug.datastructures import FileStorage
+
+
+UPLOAD_SPOOL_DIR = os.getenv('UPLOAD_SPOOL_DIR')
+
+
+def spool_uploads(files):
+    """
+    Copy uploaded CSVs to temporary files so a job can read them after the
+    request (and Werkzeug's own upload buffers) are gone.
+
+    Returns:
+        list: (filename, path) per upload; path is None for non-CSV uploads
+    """
+    spooled = []
+    try:
+        for file in files:
+            path = None
+            if file.filename and file.filename.endswith('.csv'):
+                with tempfile.NamedTemporaryFile(suffix='.csv', dir=UPLOAD_SPOOL_DIR, delete=False) as spool:
+                    path = spool.name
+                    shutil.copyfileobj(file.stream, spool, 1024 * 1024)
+            spooled.append((file.filename, path))
+    except Exception:
+        remove_spooled(spooled)
+        raise
+    return spooled
+
+
+def remove_spooled(spooled):
+    for _, path in spooled:
+        if path and os.path.exists(path):
+            os.remove(path)
+
+
+@contextmanager
+def open_spooled(spooled):
+    """Reopen spooled uploads as FileStorage objects and delete them afterwards."""
+    streams = []
+    try:
+        for _, path in spooled:
+            streams.append(open(path, 'rb') if path else io.BytesIO())
+        yield [FileStorage(stream=stream, filename=filename) for (filename, _), stream in zip(spooled, streams)]
+    finally:
+        for stream in streams:
+            stream.close()
+        remove_spooled(spooled)
+
+
+class UploadJob:
+    """
+    Progress of one background upload.
+
+    Each file entry tracks rows and bytes processed so far; throughput and ETA
+    are derived from them when the job is serialised.
+    """
+
+    def __init__(self, backend, db_name, files):
+        self.id = uuid.uuid4().hex
+        self.backend = backend
+        self.db_name = db_name
+        self.status = "queued"
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+        self.files = [
+            {
+                "filename": filename,
+                "status": "queued",
+                "rows_processed": 0,
+                "bytes_processed": 0,
+                "bytes_total": size,
+                "started_at": None,
+                "finished_at": None,
+                "result": None,
+            }
+            for filename, size in files
+        ]
+
+    def progress_callback(self, index):
+        entry = self.files[index]
+
+        def progress(rows, bytes_processed=None):
+            with self._lock:
+                if entry["started_at"] is None:
+                    entry["started_at"] = time.time()
+                    entry["status"] = "running"
+                entry["rows_processed"] = rows
+                if bytes_processed is not None:
+                    entry["bytes_processed"] = bytes_processed
+        return progress
+
+    def file_finished(self, index, result):
+        with self._lock:
+            entry = self.files[index]
+            if entry["started_at"] is None:
+                entry["started_at"] = time.time()
+            entry["status"] = result.get("status", "success")
+            entry["rows_processed"] = result.get("rows_inserted", entry["rows_processed"])
+            if entry["bytes_total"] is not None and entry["status"] in ("success", "partial"):
+                entry["bytes_processed"] = entry["bytes_total"]
+            entry["finished_at"] = time.time()
+            entry["result"] = result
+
+    @staticmethod
+    def _file_view(entry, now):
+        view = {k: v for k, v in entry.items() if k not in ("started_at", "finished_at")}
+        started = entry["started_at"]
+        elapsed = (entry["finished_at"] or now) - started if started else 0
+        view["elapsed_sec"] = round(elapsed, 3)
+        view["rows_per_sec"] = round(entry["rows_processed"] / elapsed, 1) if elapsed > 0 else None
+        eta = None
+        if entry["status"] == "running" and entry["bytes_total"] and entry["bytes_processed"] and elapsed > 0:
+            byte_rate = entry["bytes_processed"] / elapsed
+            eta = round(max(entry["bytes_total"] - entry["bytes_processed"], 0) / byte_rate, 1)
+        view["eta_sec"] = eta
+        return view
+
+    def to_dict(self):
+        now = time.time()
+        with self._lock:
+            files = [self._file_view(entry, now) for entry in self.files]
+            etas = [f["eta_sec"] for f in files if f["eta_sec"] is not None]
+            elapsed = ((self.finished_at or now) - self.started_at) if self.started_at else 0
+            rows = sum(f["rows_processed"] for f in files)
+            return {
+                "job_id": self.id,
+                "backend": self.backend,
+                "db_name": self.db_name,
+                "status": self.status,
+                "error": self.error,
+                "rows_processed": rows,
+                "rows_per_sec": round(rows / elapsed, 1) if elapsed > 0 else None,
+                "elapsed_sec": round(elapsed, 3),
+                "eta_sec": max(etas) if etas else None,
+                "files": files,
+                "results": [f["result"] for f in files] if self.status in ("completed", "failed") else None,
+            }
+
+
+class JobRegistry:
+    """
+    Runs upload jobs on a small background executor and keeps them for polling.
+
+    Jobs live in this process only, so with several gunicorn workers a client
+    must poll the worker that accepted the upload (sticky sessions or a single
+    worker, as in app.yaml).
+
+    Args:
+        max_workers (int): Jobs that may run at the same time
+        retention (float): Seconds a finished job stays available for polling
+    """
+
+    def __init__(self, max_workers=2, retention=3600):
+        self.max_workers = max_workers
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._executor = None
+        self._pid = None
+
+    def _get_executor(self):
+        # Executor threads do not survive a fork, so each worker builds its own.
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="upload-job")
+            self._pid = os.getpid()
+            self._jobs = {}
+        return self._executor
+
+    def _purge(self, now):
+        for job_id, job in list(self._jobs.items()):
+            if job.finished_at and now - job.finished_at > self.retention:
+                del self._jobs[job_id]
+
+    def submit(self, job, run):
+        """Queue ``run(job)``, which reports per-file progress and results through the job."""
+        with self._lock:
+            executor = self._get_executor()
+            self._purge(time.time())
+            self._jobs[job.id] = job
+        executor.submit(self._run, job, run)
+        return job
+
+    @staticmethod
+    def _run(job, run):
+        job.started_at = time.time()
+        job.status = "running"
+        try:
+            run(job)
+            job.finished_at = time.time()
+            job.status = "completed"
+        except Exception as e:
+            print(f"Upload job {job.id} failed: {e}")
+            job.error = str(e)
+            job.finished_at = time.time()
+            job.status = "failed"
+
+    def get(self, job_id):
+        with self._lock:
+            if self._pid != os.getpid():
+                return None
+            return self._jobs.get(job_id)
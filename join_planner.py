@@ -0,0 +1,167 @@
+import re
+import threading
+from collections import OrderedDict, deque
+
+from schema_index import schema_index_for
+
+
+JOIN_GRAPH_CACHE_SIZE = 32
+
+# Shared columns that look like keys are preferred as join columns.
+KEY_COLUMN_PATTERN = re.compile(r"(?:id|key|code)$", re.IGNORECASE)
+
+
+class JoinGraph:
+    """
+    Tables as nodes, joinable pairs as edges.
+
+    Two tables are joined on a column they share; key-like columns (declared
+    keys or names ending in ID/Key/Code) win over other shared columns, then
+    the alphabetically first one, so the choice is deterministic. Declared
+    ``foreign_keys`` replace the inferred edge between their two tables.
+    Shortest paths between every pair of tables are computed once with BFS, so
+    planning a query only walks those paths.
+
+    Args:
+        schema (dict): Table name -> column names or typed column entries, or its SchemaIndex
+        foreign_keys (iterable): (table, column, referenced table, referenced column)
+        row_counts (dict): Optional table name -> estimated row count used to order joins
+    """
+
+    def __init__(self, schema, foreign_keys=(), row_counts=None):
+        index = schema_index_for(schema)
+        self.tables = sorted(index.tables)
+        self.row_counts = row_counts or {}
+
+        def join_column_rank(table_a, table_b, column):
+            is_key = (column in index.declared_keys[table_a] or column in index.declared_keys[table_b]
+                      or KEY_COLUMN_PATTERN.search(column))
+            return not is_key, column
+
+        # edges[a][b] = (column in a, column in b)
+        self.edges = {table: {} for table in self.tables}
+        for (table_a, table_b), shared in index.shared_columns.items():
+            column = min(shared, key=lambda name: join_column_rank(table_a, table_b, name))
+            self.edges[table_a][table_b] = (column, column)
+        for table, column, ref_table, ref_column in foreign_keys:
+            if table in self.edges and ref_table in self.edges:
+                self.edges[table][ref_table] = (column, ref_column)
+                self.edges[ref_table][table] = (ref_column, column)
+
+        # parents[source][table] is the previous table on a shortest path from source.
+        self.parents = {}
+        self.distances = {}
+        for table in self.tables:
+            self.parents[table], self.distances[table] = self._bfs(table)
+
+    def _bfs(self, source):
+        parents = {source: None}
+        distances = {source: 0}
+        queue = deque([source])
+        while queue:
+            table = queue.popleft()
+            for neighbour in sorted(self.edges[table]):
+                if neighbour not in parents:
+                    parents[neighbour] = table
+                    distances[neighbour] = distances[table] + 1
+                    queue.append(neighbour)
+        return parents, distances
+
+    def distance(self, table_a, table_b):
+        """Number of joins between two tables, or None if they are not connected."""
+        return self.distances[table_a].get(table_b)
+
+    def connecting_tree(self, terminals):
+        """
+        Return the tables of a small tree connecting all ``terminals``.
+
+        Uses the shortest-path Steiner heuristic: starting from the first
+        terminal, repeatedly attach the terminal closest to the tree along its
+        shortest path. Intermediate tables (e.g. enrollments between students
+        and courses) are pulled in this way.
+
+        Raises:
+            ValueError: If a table is unknown or cannot be reached
+        """
+        for table in terminals:
+            if table not in self.edges:
+                raise ValueError(f"Table '{table}' not found in schema.")
+        tree = {terminals[0]}
+        remaining = [table for table in dict.fromkeys(terminals) if table not in tree]
+        while remaining:
+            best = None
+            for terminal in remaining:
+                for node in sorted(tree):
+                    hops = self.distance(node, terminal)
+                    if hops is not None and (best is None or hops < best[0]):
+                        best = (hops, node, terminal)
+            if best is None:
+                raise ValueError(f"No join path found between '{terminals[0]}' and '{remaining[0]}'.")
+            _, node, table = best
+            remaining.remove(table)
+            parents = self.parents[node]
+            while table not in tree:
+                tree.add(table)
+                table = parents[table]
+        return tree
+
+    def plan(self, terminals):
+        """
+        Plan the joins needed to query columns from all ``terminals``.
+
+        The first terminal is the FROM table. The remaining tables of the
+        connecting tree are joined in order of estimated row count (smallest
+        first), then distance from the FROM table, each to a table that is
+        already joined.
+
+        Returns:
+            list: (table, join condition) pairs; the first condition is None
+        """
+        terminals = list(dict.fromkeys(terminals))
+        tree = self.connecting_tree(terminals)
+        root = terminals[0]
+        depth = {table: self.distance(root, table) for table in tree}
+        plan = [(root, None)]
+        joined = {root}
+        while len(joined) < len(tree):
+            candidates = [
+                (self.row_counts.get(table, 0), depth[table], table, neighbour)
+                for table in tree - joined
+                for neighbour in sorted(self.edges[table])
+                if neighbour in joined
+            ]
+            _, _, table, neighbour = min(candidates)
+            left, right = self.edges[neighbour][table]
+            plan.append((table, f"{neighbour}.{left} = {table}.{right}"))
+            joined.add(table)
+        return plan
+
+
+_join_graphs = OrderedDict()
+_join_graphs_lock = threading.Lock()
+
+
+def join_graph_for(schema, foreign_keys=(), row_counts=None):
+    """
+    Return the JoinGraph for ``schema``, building it once per schema version.
+
+    Graphs are cached by schema fingerprint, so a schema reloaded after an
+    upload gets a fresh graph and unchanged schemas reuse theirs. ``schema``
+    may also be its SchemaIndex.
+    """
+    schema = schema_index_for(schema)
+    foreign_keys = tuple(foreign_keys)
+    key = (schema.fingerprint, foreign_keys, tuple(sorted((row_counts or {}).items())))
+    with _join_graphs_lock:
+        graph = _join_graphs.get(key)
+        if graph is not None:
+            _join_graphs.move_to_end(key)
+            return graph
+
+    graph = JoinGraph(schema, foreign_keys, row_counts)
+
+    with _join_graphs_lock:
+        _join_graphs[key] = graph
+        while len(_join_graphs) > JOIN_GRAPH_CACHE_SIZE:
+            _join_graphs.popitem(last=False)
+    return graph
@@ -0,0 +1,106 @@
+import datetime
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from bson import Decimal128, ObjectId
+from bson.int64 import Int64
+
+
+MONGO_SCHEMA_SAMPLE_SIZE = int(os.getenv('MONGO_SCHEMA_SAMPLE_SIZE', '100'))
+MONGO_SCHEMA_WORKERS = int(os.getenv('MONGO_SCHEMA_WORKERS', '8'))
+
+# BSON type -> the coarse type used by query generation (int/float/string).
+BSON_TYPE_GROUPS = {
+    "int": "int",
+    "long": "int",
+    "double": "float",
+    "decimal": "float",
+    "string": "string",
+}
+
+
+def bson_type(value):
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, Int64):
+        return "long"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "double"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, datetime.datetime):
+        return "date"
+    if isinstance(value, ObjectId):
+        return "objectId"
+    if isinstance(value, Decimal128):
+        return "decimal"
+    if isinstance(value, dict):
+        return "object"
+    if isinstance(value, list):
+        return "array"
+    if isinstance(value, bytes):
+        return "binData"
+    return type(value).__name__
+
+
+def profile_documents(documents):
+    """
+    Merge sampled documents into a typed field list.
+
+    Fields keep the order in which they were first seen. ``null_ratio`` counts
+    both explicit nulls (or NaN) and documents where the field is missing.
+
+    Returns:
+        list: {"name", "type", "types", "null_ratio"} per field
+    """
+    types = {}
+    nulls = Counter()
+    for document in documents:
+        for name, value in document.items():
+            if name == '_id':
+                continue
+            if isinstance(value, float) and value != value:
+                value = None
+            type_name = bson_type(value)
+            types.setdefault(name, Counter())[type_name] += 1
+            if type_name == "null":
+                nulls[name] += 1
+
+    sampled = len(documents)
+    fields = []
+    for name, counts in types.items():
+        present = sum(counts.values())
+        non_null = [(count, type_name) for type_name, count in counts.items() if type_name != "null"]
+        main_type = max(non_null)[1] if non_null else "null"
+        fields.append({
+            "name": name,
+            "type": BSON_TYPE_GROUPS.get(main_type, main_type),
+            "types": dict(counts),
+            "null_ratio": round((nulls[name] + sampled - present) / sampled, 4) if sampled else 0.0,
+        })
+    return fields
+
+
+def profile_collection(collection, sample_size=MONGO_SCHEMA_SAMPLE_SIZE):
+    documents = list(collection.aggregate([{"$sample": {"size": sample_size}}]))
+    return profile_documents(documents)
+
+
+def profile_database(db, sample_size=MONGO_SCHEMA_SAMPLE_SIZE):
+    """
+    Profile every non-empty collection of ``db`` concurrently with ``$sample``.
+
+    Returns:
+        dict: Collection name -> typed field list (see ``profile_documents``)
+    """
+    names = db.list_collection_names()
+    if not names:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(MONGO_SCHEMA_WORKERS, len(names))) as executor:
+        profiles = executor.map(lambda name: profile_collection(db[name], sample_size), names)
+        return {name: fields for name, fields in zip(names, profiles) if fields}
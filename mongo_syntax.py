@@ -0,0 +1,241 @@
+import datetime
+import re
+
+from bson import Decimal128, ObjectId
+from bson.regex import Regex
+
+
+class MongoSyntaxError(ValueError):
+    """Raised for malformed query text; ``position`` is the character offset of the problem."""
+
+    def __init__(self, message, position):
+        super().__init__(f"{message} at offset {position}")
+        self.position = position
+
+
+TOKEN_PATTERN = re.compile(r"""
+    (?P<space>\s+|//[^\n]*|/\*.*?\*/)
+  | (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+  | (?P<number>-?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<regex>/(?:[^/\\\n]|\\.)+/[a-z]*)
+  | (?P<word>(?:[^\W\d]|\$)[\w$]*)
+  | (?P<punct>[{}\[\]:,().;])
+""", re.VERBOSE | re.DOTALL)
+STRING_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f"}
+ESCAPE_PATTERN = re.compile(r"\\(u[0-9a-fA-F]{4}|.)", re.DOTALL)
+KEYWORD_VALUES = {"true": True, "false": False, "null": None, "undefined": None}
+
+
+def _unescape(body):
+    def replace(match):
+        escape = match.group(1)
+        if len(escape) == 5:
+            return chr(int(escape[1:], 16))
+        return STRING_ESCAPES.get(escape, escape)
+    return ESCAPE_PATTERN.sub(replace, body)
+
+
+def _parse_date(value=None):
+    if value is None:
+        return datetime.datetime.now(datetime.timezone.utc)
+    return datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+# Shell helpers the LLM tends to write, called with their argument (if any).
+SHELL_FUNCTIONS = {
+    "ISODate": _parse_date,
+    "Date": _parse_date,
+    "ObjectId": lambda value=None: ObjectId(value),
+    "NumberInt": int,
+    "NumberLong": int,
+    "NumberDecimal": lambda value: Decimal128(str(value)),
+}
+
+
+def tokenize(text):
+    """
+    Split shell-style query text into (kind, value, position) tokens in one pass.
+
+    Punctuation tokens use the character itself as their kind.
+    """
+    tokens = []
+    append = tokens.append
+    match_token = TOKEN_PATTERN.match
+    position = 0
+    length = len(text)
+    while position < length:
+        match = match_token(text, position)
+        if match is None:
+            raise MongoSyntaxError(f"Unexpected character {text[position]!r}", position)
+        kind = match.lastgroup
+        if kind == "punct":
+            append((match.group(), None, position))
+        elif kind == "string":
+            body = match.group()[1:-1]
+            append(("string", _unescape(body) if "\\" in body else body, position))
+        elif kind == "word":
+            append(("word", match.group(), position))
+        elif kind == "number":
+            value = match.group()
+            is_float = "." in value or "e" in value or "E" in value
+            append(("number", float(value) if is_float else int(value), position))
+        elif kind == "regex":
+            value = match.group()
+            end = value.rindex("/")
+            append(("regex", Regex(value[1:end], value[end + 1:]), position))
+        position = match.end()
+    append(("end", None, length))
+    return tokens
+
+
+class MongoQueryParser:
+    """
+    Recursive-descent parser for the relaxed JSON that mongo shell queries use.
+
+    Accepts unquoted keys, single- or double-quoted strings, true/false/null,
+    trailing commas, comments, regex literals and the ISODate/ObjectId/Number*
+    helpers. Each character is read once by the tokenizer, so parsing is linear
+    in the length of the text regardless of nesting depth.
+    """
+
+    def __init__(self, text):
+        self.tokens = tokenize(text)
+        self.index = 0
+
+    def peek(self):
+        return self.tokens[self.index]
+
+    def accept(self, kind, value=None):
+        token = self.tokens[self.index]
+        if token[0] == kind and (value is None or token[1] == value):
+            self.index += 1
+            return token
+        return None
+
+    def expect(self, kind, value=None):
+        token = self.accept(kind, value)
+        if token is None:
+            raise self.error(f"Expected {value or kind}")
+        return token
+
+    def error(self, message):
+        kind, value, position = self.tokens[self.index]
+        found = "end of input" if kind == "end" else repr(kind if value is None else value)
+        return MongoSyntaxError(f"{message}, found {found}", position)
+
+    def parse_value(self):
+        kind, value, position = self.tokens[self.index]
+        if kind == "{":
+            return self.parse_object()
+        if kind == "[":
+            return self.parse_array()
+        if kind == "string" or kind == "number" or kind == "regex":
+            self.index += 1
+            return value
+        if kind == "word":
+            self.index += 1
+            return self.parse_word(value, position)
+        raise self.error("Expected a value")
+
+    def parse_word(self, value, position):
+        if value == "new" and self.tokens[self.index][0] == "word":
+            _, value, position = self.tokens[self.index]
+            self.index += 1
+        if value in SHELL_FUNCTIONS and self.accept("("):
+            arguments = [] if self.accept(")") else [self.parse_value()]
+            if arguments:
+                self.expect(")")
+            try:
+                return SHELL_FUNCTIONS[value](*arguments)
+            except Exception as e:
+                raise MongoSyntaxError(f"Invalid {value}() argument: {e}", position) from None
+        if value in KEYWORD_VALUES:
+            return KEYWORD_VALUES[value]
+        # Bare words such as { $count: total } are kept as strings.
+        return value
+
+    def parse_object(self):
+        tokens = self.tokens
+        self.index += 1
+        result = {}
+        while True:
+            kind, key, position = tokens[self.index]
+            if kind == "}":
+                self.index += 1
+                return result
+            if kind != "string" and kind != "word" and kind != "number":
+                raise self.error("Expected a key")
+            if tokens[self.index + 1][0] != ":":
+                self.index += 1
+                raise self.error("Expected :")
+            self.index += 2
+            result[key if kind != "number" else str(key)] = self.parse_value()
+            kind = tokens[self.index][0]
+            if kind == ",":
+                self.index += 1
+            elif kind != "}":
+                raise self.error("Expected , or }")
+
+    def parse_array(self):
+        tokens = self.tokens
+        self.index += 1
+        result = []
+        append = result.append
+        while True:
+            if tokens[self.index][0] == "]":
+                self.index += 1
+                return result
+            append(self.parse_value())
+            kind = tokens[self.index][0]
+            if kind == ",":
+                self.index += 1
+            elif kind != "]":
+                raise self.error("Expected , or ]")
+
+    def parse_collection(self):
+        """Read ``db.<name>`` or ``db.getCollection("<name>")``."""
+        token = self.accept("word", "db")
+        if token is None:
+            raise self.error("Query must start with db.<collection>")
+        self.expect(".")
+        name = self.expect("word")[1]
+        if name == "getCollection" and self.accept("("):
+            name = self.expect("string")[1]
+            self.expect(")")
+        return name
+
+    def parse_aggregate(self):
+        collection = self.parse_collection()
+        self.expect(".")
+        if self.accept("word", "aggregate") is None:
+            raise self.error("Only aggregate() is supported")
+        self.expect("(")
+        if self.peek()[0] != "[":
+            raise self.error("Expected the aggregation pipeline array")
+        pipeline = self.parse_array()
+        if self.accept(","):
+            if self.peek()[0] == "{":
+                self.parse_object()  # aggregate() options are not forwarded
+        self.expect(")")
+        # Tolerate trailing cursor helpers such as .toArray() or .pretty().
+        while self.accept("."):
+            self.expect("word")
+            self.expect("(")
+            self.expect(")")
+        self.accept(";")
+        if self.peek()[0] != "end":
+            raise self.error("Unexpected text after the query")
+        return collection, pipeline
+
+
+def parse_mongo_query(text):
+    """
+    Parse ``db.<collection>.aggregate([...])`` text into Python objects.
+
+    Returns:
+        tuple: (collection name, pipeline)
+
+    Raises:
+        MongoSyntaxError: With the character offset of the first problem
+    """
+    return MongoQueryParser(text).parse_aggregate()
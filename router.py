@@ -0,0 +1,239 @@
+import threading
+import time
+from collections import namedtuple
+
+from gemini import LLMUnavailableError
+from regex import QUERY_IDENTIFIER_PATTERN
+from schema_index import schema_index_for
+from sql_ast import Column, SQLTranslationError, parse_sql, walk
+from utils import mongo_query_generator, query_generator
+
+
+# ``option`` values understood by query_generator / mongo_query_generator.
+RULES_OPTION = 0
+LLM_OPTION = 1
+
+TRANSLATOR_MODES = ("rules", "llm", "hybrid")
+
+# Why a hybrid request left the rule-based path, in the order they are checked.
+ESCALATION_REASONS = ("no_match", "invalid", "unsupported", "low_confidence")
+
+# query is the SQL text, or (text, collection, pipeline) for MongoDB. option is
+# the query_generator option that produced it, e.g. to discard cache entries.
+Route = namedtuple("Route", "query path option confidence reason")
+
+
+def rule_confidence(question, sql, schema):
+    """
+    Score a rule-based SQL translation of ``question`` between 0 and 1.
+
+    The query must parse and only reference tables and columns of ``schema``
+    (select aliases aside). The score is the share of the schema identifiers
+    named in the question that the query uses, so a template that matched but
+    dropped a column the user asked about scores low.
+
+    Returns:
+        float: Confidence, or None when the query is invalid
+    """
+    index = schema_index_for(schema)
+    try:
+        select = parse_sql(sql)
+    except SQLTranslationError:
+        return None
+
+    table_refs = [select.table] + [join.table for join in select.joins]
+    if any(ref.name not in index.column_sets for ref in table_refs):
+        return None
+    aliases = {ref.alias for ref in table_refs if ref.alias}
+    aliases.update(item.alias for item in select.items or () if item.alias)
+
+    used = {ref.name for ref in table_refs}
+    for node in walk(select):
+        if isinstance(node, Column):
+            if node.name in index.column_tables:
+                used.add(node.name)
+            elif node.name not in aliases:
+                return None
+
+    mentioned = set()
+    for word in QUERY_IDENTIFIER_PATTERN.findall(question):
+        name = (index.find_column(word) or index.find_table(word)) if word else None
+        if name is not None:
+            mentioned.add(name)
+    if not mentioned:
+        return 1.0
+    return len(mentioned & used) / len(mentioned)
+
+
+class TranslatorRouter:
+    """
+    Chooses between the rule-based translator and the LLM per request.
+
+    In "hybrid" mode the rules run first; their SQL is served when it is valid
+    for the schema, converts to a pipeline (for MongoDB) and reaches
+    ``min_confidence`` (see ``rule_confidence``). Otherwise the question is
+    escalated to the LLM, and if that fails a low-confidence rule translation
+    is still served. "rules" and "llm" force one path, as the old
+    global option did, except that "llm" still falls back to the rules while
+    the model is unavailable (LLMUnavailableError, e.g. an open circuit).
+
+    Args:
+        mode (str): Default mode, one of TRANSLATOR_MODES
+        min_confidence (float): Lowest rule confidence served without escalating
+        cache (TranslationCache): Optional cache passed to the generators
+        semantic_cache (SemanticCache): Optional cache for LLM translations
+    """
+
+    def __init__(self, mode="hybrid", min_confidence=0.75, cache=None, semantic_cache=None):
+        if mode not in TRANSLATOR_MODES:
+            raise ValueError(f"Unknown translator mode '{mode}'. Use one of: {', '.join(TRANSLATOR_MODES)}.")
+        self.mode = mode
+        self.min_confidence = min_confidence
+        self.cache = cache
+        self.semantic_cache = semantic_cache
+        self._lock = threading.Lock()
+        self._served = {"rules": 0, "llm": 0}
+        self._time = {"rules": 0.0, "llm": 0.0}
+        self._time_max = {"rules": 0.0, "llm": 0.0}
+        self._escalations = dict.fromkeys(ESCALATION_REASONS, 0)
+        self._llm_failures = 0
+
+    def resolve_mode(self, mode=None):
+        """Return ``mode`` (e.g. from the request body) or the default, rejecting unknown modes."""
+        if mode is None:
+            return self.mode
+        if mode not in TRANSLATOR_MODES:
+            raise ValueError(f"Unknown translator mode '{mode}'. Use one of: {', '.join(TRANSLATOR_MODES)}.")
+        return mode
+
+    def _assess(self, question, sql, schema):
+        """Return (escalation reason or None, confidence) for a rule-based SQL translation."""
+        if sql is None:
+            return "no_match", 0.0
+        confidence = rule_confidence(question, sql, schema)
+        if confidence is None:
+            return "invalid", 0.0
+        if confidence < self.min_confidence:
+            return "low_confidence", confidence
+        return None, confidence
+
+    def _record(self, route, start):
+        elapsed = time.monotonic() - start
+        with self._lock:
+            self._served[route.path] += 1
+            self._time[route.path] += elapsed
+            self._time_max[route.path] = max(self._time_max[route.path], elapsed)
+            if route.reason is not None:
+                self._escalations[route.reason] += 1
+        return route
+
+    def _escalate(self, translate, fallback, confidence, reason):
+        """
+        Serve the LLM translation, or ``fallback`` from the rules if the LLM fails.
+
+        Only a low-confidence fallback is served; rule output rejected as
+        invalid is known to be broken, so the LLM error is raised instead.
+        """
+        try:
+            query = translate()
+            if not query:
+                raise ValueError("The LLM returned no query.")
+        except Exception:
+            if fallback is None or reason != "low_confidence":
+                raise
+            with self._lock:
+                self._llm_failures += 1
+            return Route(fallback, "rules", RULES_OPTION, confidence, reason)
+        return Route(query, "llm", LLM_OPTION, None, reason)
+
+    def _forced(self, mode, translate):
+        if mode == "rules":
+            return Route(translate(RULES_OPTION), "rules", RULES_OPTION, None, None)
+        try:
+            return Route(translate(LLM_OPTION), "llm", LLM_OPTION, None, None)
+        except LLMUnavailableError as error:
+            try:
+                query = translate(RULES_OPTION)
+            except ValueError:
+                query = None
+            if query is None:
+                raise error
+            with self._lock:
+                self._llm_failures += 1
+            return Route(query, "rules", RULES_OPTION, None, None)
+
+    def translate_sql(self, question, schema, mode=None, foreign_keys=(), row_counts=None):
+        """
+        Translate ``question`` into MySQL.
+
+        ``foreign_keys`` and ``row_counts`` are handed to the rule-based join planner.
+
+        Returns:
+            Route: With the SQL text as ``query``
+        """
+        mode = self.resolve_mode(mode)
+        start = time.monotonic()
+
+        def translate(option):
+            return query_generator(question, schema, database="sql", option=option, cache=self.cache,
+                                   semantic_cache=self.semantic_cache, foreign_keys=foreign_keys,
+                                   row_counts=row_counts)
+
+        if mode != "hybrid":
+            return self._record(self._forced(mode, translate), start)
+
+        sql = translate(RULES_OPTION)
+        reason, confidence = self._assess(question, sql, schema)
+        if reason is None:
+            return self._record(Route(sql, "rules", RULES_OPTION, confidence, None), start)
+        return self._record(self._escalate(lambda: translate(LLM_OPTION), sql, confidence, reason), start)
+
+    def translate_mongo(self, question, schema, mode=None):
+        """
+        Translate ``question`` into a MongoDB aggregation.
+
+        Returns:
+            Route: With (query text, collection name, pipeline) as ``query``
+        """
+        mode = self.resolve_mode(mode)
+        start = time.monotonic()
+
+        def translate(option):
+            return mongo_query_generator(question, schema, option=option, cache=self.cache,
+                                         semantic_cache=self.semantic_cache)
+
+        if mode != "hybrid":
+            return self._record(self._forced(mode, translate), start)
+
+        # The rule-based pipeline is compiled from the rule-based SQL, so the SQL is what gets scored.
+        sql = query_generator(question, schema, database="sql", option=RULES_OPTION, cache=self.cache)
+        reason, confidence = self._assess(question, sql, schema)
+        result = None
+        if sql is not None:
+            try:
+                result = translate(RULES_OPTION)
+            except ValueError:
+                reason = reason or "unsupported"
+        if reason is None:
+            return self._record(Route(result, "rules", RULES_OPTION, confidence, None), start)
+        return self._record(self._escalate(lambda: translate(LLM_OPTION), result, confidence, reason), start)
+
+    def stats(self):
+        with self._lock:
+            total = sum(self._served.values())
+            return {
+                "mode": self.mode,
+                "min_confidence": self.min_confidence,
+                "requests": total,
+                "paths": {
+                    path: {
+                        "served": served,
+                        "share": round(served / total, 4) if total else 0.0,
+                        "ms_avg": round(1000 * self._time[path] / served, 3) if served else 0.0,
+                        "ms_max": round(1000 * self._time_max[path], 3),
+                    }
+                    for path, served in self._served.items()
+                },
+                "escalations": dict(self._escalations),
+                "llm_failures_served_by_rules": self._llm_failures,
+            }
@@ -0,0 +1,292 @@
+import difflib
+import re
+import threading
+from collections import Counter, OrderedDict
+from types import MappingProxyType
+
+from cache import schema_fingerprint
+
+
+SCHEMA_INDEX_CACHE_SIZE = 32
+
+# camelCase, PascalCase, ACRONYMS, snake_case and digits each become one part.
+NAME_PART_PATTERN = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+# Spellings of the same name part; both sides normalise to the value.
+NAME_SYNONYMS = {
+    "identifier": "id",
+    "number": "num", "no": "num", "nbr": "num",
+    "quantity": "qty",
+    "department": "dept",
+    "description": "desc",
+    "amount": "amt",
+    "telephone": "phone", "tel": "phone",
+}
+# Fuzzy matches need this difflib ratio and must beat the runner-up by FUZZY_MARGIN.
+FUZZY_MIN_RATIO = 0.8
+FUZZY_MARGIN = 0.05
+FUZZY_MIN_LENGTH = 4
+FUZZY_CANDIDATES = 5
+TEXT_WORD_PATTERN = re.compile(r"'[^']*'|\"[^\"]*\"|\w+")
+
+
+def normalize_name(name):
+    """
+    Reduce an identifier to lowercase name parts with synonyms folded.
+
+    "StudentID", "student_id" and "Student Identifier" all become "studentid".
+    """
+    return "".join(NAME_SYNONYMS.get(part, part) for part in (p.lower() for p in NAME_PART_PATTERN.findall(name)))
+
+
+def name_trigrams(name):
+    padded = f"  {name} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SchemaIndex:
+    """
+    Read-only lookup structures for one schema version.
+
+    Built once per schema and shared between threads, so every mapping is a
+    read-only view over tuples and frozensets.
+
+    Attributes:
+        fingerprint (str): ``schema_fingerprint`` of the source schema
+        tables (tuple): Table names in schema order
+        table_columns (mapping): Table -> column names in schema order
+        column_sets (mapping): Table -> frozenset of column names
+        declared_keys (mapping): Table -> frozenset of columns with key metadata (typed schemas only)
+        column_tables (mapping): Column -> tables containing it, in schema order
+        shared_columns (mapping): (table_a, table_b) -> frozenset of shared columns, both orders,
+            only for pairs that share at least one column
+    """
+
+    __slots__ = (
+        "fingerprint", "tables", "table_columns", "column_sets", "declared_keys",
+        "column_tables", "shared_columns", "_folded_columns", "_folded_tables",
+        "_normalized_columns", "_normalized_tables", "_trigram_columns", "_trigram_tables", "_fuzzy_memo",
+        "_identifier_pattern",
+    )
+
+    def __init__(self, schema, fingerprint=None):
+        self.fingerprint = fingerprint or schema_fingerprint(schema)
+        self.tables = tuple(schema)
+
+        table_columns = {}
+        declared_keys = {}
+        column_tables = {}
+        for table, columns in schema.items():
+            names = tuple(column["name"] if isinstance(column, dict) else column for column in columns)
+            table_columns[table] = names
+            declared_keys[table] = frozenset(
+                column["name"] for column in columns if isinstance(column, dict) and column.get("key")
+            )
+            for name in dict.fromkeys(names):
+                column_tables.setdefault(name, []).append(table)
+        self.table_columns = MappingProxyType(table_columns)
+        self.column_sets = MappingProxyType({table: frozenset(names) for table, names in table_columns.items()})
+        self.declared_keys = MappingProxyType(declared_keys)
+        self.column_tables = MappingProxyType({column: tuple(tables) for column, tables in column_tables.items()})
+
+        # Pairs are only reachable through a column they share, so walking the
+        # inverted index visits each sharing pair without testing the rest.
+        shared = {}
+        for column, tables in column_tables.items():
+            for i, table_a in enumerate(tables):
+                for table_b in tables[i + 1:]:
+                    shared.setdefault((table_a, table_b), set()).add(column)
+        shared_columns = {}
+        for (table_a, table_b), columns in shared.items():
+            shared_columns[(table_a, table_b)] = shared_columns[(table_b, table_a)] = frozenset(columns)
+        self.shared_columns = MappingProxyType(shared_columns)
+
+        folded_columns = {}
+        for column in column_tables:
+            folded_columns.setdefault(column.casefold(), []).append(column)
+        self._folded_columns = MappingProxyType({name: tuple(columns) for name, columns in folded_columns.items()})
+        self._folded_tables = MappingProxyType({table.casefold(): table for table in reversed(self.tables)})
+
+        # Normalised names (first spelling in schema order wins) and a trigram
+        # inverted index over them for typo-tolerant lookups.
+        self._normalized_columns = MappingProxyType(self._first_by_key(column_tables, normalize_name))
+        self._normalized_tables = MappingProxyType(self._first_by_key(self.tables, normalize_name))
+        self._trigram_columns = MappingProxyType(self._trigram_index(self._normalized_columns))
+        self._trigram_tables = MappingProxyType(self._trigram_index(self._normalized_tables))
+        # Users repeat their typos; remembered fuzzy results make repeats a dict lookup.
+        self._fuzzy_memo = {}
+
+        # Quoted strings or whole-word identifiers, so canonicalize only calls
+        # back for words it may rewrite. Longest names first, so prefixes lose.
+        identifiers = sorted(
+            (name for name in (*self._folded_columns, *self._folded_tables) if TEXT_WORD_PATTERN.fullmatch(name)),
+            key=len, reverse=True
+        )
+        self._identifier_pattern = re.compile(
+            r"""'[^']*'|"[^"]*"|\b(?:""" + "|".join(map(re.escape, identifiers)) + r")\b", re.IGNORECASE
+        ) if identifiers else None
+
+    @staticmethod
+    def _first_by_key(names, key):
+        result = {}
+        for name in names:
+            result.setdefault(key(name), name)
+        return result
+
+    @staticmethod
+    def _trigram_index(normalized):
+        index = {}
+        for name in normalized:
+            for trigram in name_trigrams(name):
+                index.setdefault(trigram, []).append(name)
+        return {trigram: tuple(names) for trigram, names in index.items()}
+
+    def _fuzzy(self, name, normalized, trigram_index):
+        """Closest normalised name by difflib ratio among the names sharing the most trigrams."""
+        if len(name) < FUZZY_MIN_LENGTH:
+            return None
+        memo_key = (name, id(normalized))
+        if memo_key in self._fuzzy_memo:
+            return self._fuzzy_memo[memo_key]
+
+        overlap = Counter()
+        for trigram in name_trigrams(name):
+            overlap.update(trigram_index.get(trigram, ()))
+        # A ratio of FUZZY_MIN_RATIO is impossible once the lengths differ by more than this.
+        max_length_gap = len(name) * (1 - FUZZY_MIN_RATIO) / FUZZY_MIN_RATIO + 1
+        scored = sorted(
+            ((difflib.SequenceMatcher(None, name, candidate).ratio(), candidate)
+             for candidate, _ in overlap.most_common(FUZZY_CANDIDATES)
+             if abs(len(candidate) - len(name)) <= max_length_gap),
+            reverse=True
+        )
+        result = None
+        if scored and scored[0][0] >= FUZZY_MIN_RATIO:
+            # Ambiguous near-ties return None rather than guess the wrong column.
+            if len(scored) == 1 or scored[0][0] - scored[1][0] >= FUZZY_MARGIN:
+                result = normalized[scored[0][1]]
+
+        if len(self._fuzzy_memo) >= 1024:
+            self._fuzzy_memo.clear()
+        self._fuzzy_memo[memo_key] = result
+        return result
+
+    def tables_for(self, column):
+        """Tables containing ``column`` (exact name), in schema order."""
+        return self.column_tables.get(column, ())
+
+    def find_column(self, name):
+        """
+        Return the schema's spelling of column ``name``, matched case-insensitively.
+
+        An exact match wins; otherwise the first column in schema order that
+        folds to the same name. Returns None when there is no match.
+        """
+        if name in self.column_tables:
+            return name
+        columns = self._folded_columns.get(name.casefold())
+        return columns[0] if columns else None
+
+    def find_table(self, name):
+        """Return the schema's spelling of table ``name``, matched case-insensitively, or None."""
+        if name in self.column_sets:
+            return name
+        return self._folded_tables.get(name.casefold())
+
+    def resolve_column(self, name, fuzzy=True):
+        """
+        Resolve a user-written column name to the schema's spelling.
+
+        Tries, in order: exact, case-insensitive, normalised (separators,
+        case and ``NAME_SYNONYMS`` ignored) and, with ``fuzzy``, the closest
+        name by trigram candidates and difflib ratio. Returns None when nothing
+        matches unambiguously.
+        """
+        column = self.find_column(name)
+        if column is not None:
+            return column
+        normalized = normalize_name(name)
+        column = self._normalized_columns.get(normalized)
+        if column is not None or not fuzzy:
+            return column
+        return self._fuzzy(normalized, self._normalized_columns, self._trigram_columns)
+
+    def resolve_table(self, name, fuzzy=True):
+        """Resolve a user-written table name like ``resolve_column``, also accepting singular forms."""
+        table = self.find_table(name)
+        if table is not None:
+            return table
+        normalized = normalize_name(name)
+        for candidate in (normalized, f"{normalized}s", f"{normalized}es"):
+            table = self._normalized_tables.get(candidate)
+            if table is not None:
+                return table
+        if not fuzzy:
+            return None
+        return self._fuzzy(normalized, self._normalized_tables, self._trigram_tables)
+
+    def canonicalize(self, text):
+        """
+        Rewrite unquoted words that name a column or table case-insensitively in the schema's spelling.
+
+        Only case is changed, so the question keeps matching the same
+        (case-insensitive) templates while the generated query uses names the
+        database knows.
+        """
+        if self._identifier_pattern is None:
+            return text
+        folded_columns = self._folded_columns
+        folded_tables = self._folded_tables
+
+        def replace(match):
+            word = match.group()
+            if word[0] in "'\"":
+                return word
+            folded = word.casefold()
+            columns = folded_columns.get(folded)
+            if columns:
+                return word if word in self.column_tables else columns[0]
+            return folded_tables.get(folded, word)
+
+        return self._identifier_pattern.sub(replace, text)
+
+    def shared(self, table_a, table_b):
+        return self.shared_columns.get((table_a, table_b), frozenset())
+
+
+_indexes = OrderedDict()
+# id(schema) -> (schema, index); the schema is kept so its id cannot be reused.
+_indexes_by_identity = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def schema_index_for(schema):
+    """
+    Return the SchemaIndex for ``schema``, building it once per schema version.
+
+    The same schema object (e.g. the dict SchemaCache hands out until the next
+    upload) is found by identity without re-reading it, and equal schemas are
+    found by fingerprint. Schemas must therefore not be modified in place once
+    indexed. An index passed in is returned as is.
+    """
+    if isinstance(schema, SchemaIndex):
+        return schema
+    with _indexes_lock:
+        entry = _indexes_by_identity.get(id(schema))
+        if entry is not None and entry[0] is schema:
+            return entry[1]
+
+    fingerprint = schema_fingerprint(schema)
+    with _indexes_lock:
+        index = _indexes.get(fingerprint)
+    if index is None:
+        index = SchemaIndex(schema, fingerprint)
+
+    with _indexes_lock:
+        index = _indexes.setdefault(fingerprint, index)
+        _indexes.move_to_end(fingerprint)
+        while len(_indexes) > SCHEMA_INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+        _indexes_by_identity[id(schema)] = (schema, index)
+        while len(_indexes_by_identity) > SCHEMA_INDEX_CACHE_SIZE:
+            _indexes_by_identity.popitem(last=False)
+    return index
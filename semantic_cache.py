@@ -0,0 +1,267 @@
+import re
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+from cache import schema_fingerprint
+
+
+VECTOR_DIM = 1024
+
+TOKEN_PATTERN = re.compile(r"""'[^']*'|"[^"]*"|\d+(?:\.\d+)?|[<>!]=|[<>=]|\w+""")
+
+# Paraphrases rewritten to one canonical form before vectorising, longest first.
+PHRASE_SYNONYMS = [
+    (r"\btotal number of\b|\bhow many\b|\bnumber of\b", "count"),
+    (r"\bgreater than or equal to\b|\bat least\b", ">="),
+    (r"\bless than or equal to\b|\bat most\b", "<="),
+    (r"\bgreater than\b|\bmore than\b|\babove\b|\bover\b", ">"),
+    (r"\bless than\b|\bfewer than\b|\bbelow\b|\bunder\b", "<"),
+    (r"\bnot equal to\b|\bis not\b", "!="),
+    (r"\bequal to\b|\bequals\b", "="),
+    (r"\bgive me\b|\bwhat are\b|\bshow me\b", "find"),
+]
+PHRASE_SYNONYMS = [(re.compile(pattern, re.IGNORECASE), replacement) for pattern, replacement in PHRASE_SYNONYMS]
+
+WORD_SYNONYMS = {
+    "show": "find", "list": "find", "get": "find", "display": "find", "fetch": "find",
+    "retrieve": "find", "select": "find",
+    "average": "avg", "mean": "avg",
+    "maximum": "max", "highest": "max", "largest": "max", "biggest": "max",
+    "minimum": "min", "lowest": "min", "smallest": "min",
+    "total": "sum",
+    "ascending": "asc", "descending": "desc",
+    "unique": "distinct",
+    "sort": "order", "sorted": "order", "ordered": "order", "grouped": "group",
+}
+
+STOP_WORDS = {
+    "a", "an", "the", "all", "rows", "row", "records", "record", "entries", "entry", "documents",
+    "in", "of", "from", "table", "collection", "me", "please", "are", "is", "there", "what",
+    "which", "each", "every", "for", "with", "where", "have", "has", "that", "do", "does",
+}
+
+# Tokens that change what a query returns. Two prompts are only treated as the
+# same question when these appear identically and in the same order.
+MEANING_WORDS = {
+    "count", "sum", "avg", "max", "min", "asc", "desc", "distinct", "not", "null", "like",
+    "between", "and", "or", "group", "order", "limit", "top", "join",
+}
+
+# Words left after STOP_WORDS that never change the query. Every other token is
+# part of the literal guard, so unquoted values ("Major = Physics") count too.
+FILLER_WORDS = {
+    "find", "value", "values", "whose", "than", "to", "by", "on", "at", "as", "any", "some", "only",
+    "just", "also", "data", "details", "info", "information", "field", "fields", "column", "columns",
+    "result", "results", "can", "you", "i", "want", "need", "would", "see",
+}
+
+
+def prompt_tokens(prompt):
+    """Lowercase ``prompt``, fold common paraphrases and drop filler words."""
+    for pattern, replacement in PHRASE_SYNONYMS:
+        prompt = pattern.sub(f" {replacement} ", prompt)
+    tokens = []
+    for token in TOKEN_PATTERN.findall(prompt):
+        if token[0] not in "'\"":
+            token = token.lower()
+            token = WORD_SYNONYMS.get(token, token)
+        if token not in STOP_WORDS:
+            tokens.append(token)
+    return tokens
+
+
+def schema_identifiers(schema):
+    """Lowercased table and column names of a schema."""
+    identifiers = set()
+    for table, columns in schema.items():
+        identifiers.add(table.lower())
+        for column in columns:
+            identifiers.add((column["name"] if isinstance(column, dict) else column).lower())
+    return identifiers
+
+
+def literal_guard(tokens, identifiers):
+    """
+    The ordered tokens that must match exactly for a cached query to be reused.
+
+    That is every token except ``FILLER_WORDS``: values (quoted or not),
+    numbers, comparison operators, schema identifiers and ``MEANING_WORDS``.
+    "grade > 90" and "grade > 80", or "Semester = Fall" and "Semester =
+    Spring", embed almost identically, but they must never share a query.
+    """
+    return tuple(
+        token for token in tokens
+        if token in identifiers or token in MEANING_WORDS or token not in FILLER_WORDS
+    )
+
+
+def _feature_index(feature):
+    digest = zlib.crc32(feature.encode("utf-8"))
+    return digest % VECTOR_DIM, 1.0 if digest & 0x80000000 else -1.0
+
+
+def embed_tokens(tokens):
+    """
+    Hash word unigrams, bigrams and character trigrams into a unit vector.
+
+    Signed feature hashing keeps the vector size fixed without a vocabulary,
+    and the character trigrams make small typos land close together.
+    """
+    features = []
+    for i, token in enumerate(tokens):
+        features.append((f"w:{token}", 1.0))
+        if i:
+            features.append((f"b:{tokens[i - 1]} {token}", 1.0))
+        padded = f"<{token}>"
+        features.extend((f"c:{padded[j:j + 3]}", 0.5) for j in range(len(padded) - 2))
+
+    vector = np.zeros(VECTOR_DIM, dtype=np.float32)
+    for feature, weight in features:
+        index, sign = _feature_index(feature)
+        vector[index] += sign * weight
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticIndex:
+    """
+    Prompt vectors and their queries for one (schema, backend).
+
+    Vectors live in one float32 matrix that grows by doubling up to ``capacity``
+    rows. After that the oldest slot is overwritten, so a lookup is a single
+    matrix-vector product over at most ``capacity`` rows.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.vectors = np.zeros((min(capacity, 64), VECTOR_DIM), dtype=np.float32)
+        self.guards = []
+        self.queries = []
+        self.next_slot = 0
+
+    def __len__(self):
+        return len(self.queries)
+
+    def search(self, vector, guard, threshold):
+        """Return (slot, score) of the best entry above ``threshold`` with a matching guard."""
+        if not self.queries:
+            return None, 0.0
+        scores = self.vectors[:len(self.queries)] @ vector
+        candidates = np.flatnonzero(scores >= threshold)
+        for slot in candidates[np.argsort(-scores[candidates])]:
+            if self.guards[slot] == guard:
+                return int(slot), float(scores[slot])
+        return None, float(scores.max())
+
+    def add(self, vector, guard, query):
+        if len(self.queries) < self.capacity:
+            slot = len(self.queries)
+            if slot == len(self.vectors):
+                grown = np.zeros((min(self.capacity, 2 * slot), VECTOR_DIM), dtype=np.float32)
+                grown[:slot] = self.vectors
+                self.vectors = grown
+            self.guards.append(guard)
+            self.queries.append(query)
+        else:
+            slot = self.next_slot
+            self.next_slot = (slot + 1) % self.capacity
+            self.guards[slot] = guard
+            self.queries[slot] = query
+        self.vectors[slot] = vector
+
+    def remove(self, slot):
+        # Poisoning the guard makes the slot unmatchable until it is overwritten.
+        self.guards[slot] = None
+
+
+class SemanticCache:
+    """
+    Near-duplicate cache for LLM translations.
+
+    Prompts are embedded with ``embed_tokens`` and compared by cosine
+    similarity against earlier prompts asked of the same schema and backend. A
+    cached query is returned when the similarity reaches ``threshold`` and the
+    literal guard (values, operators, identifiers) matches exactly. Indexes are
+    kept for the ``max_schemas`` most recently used schemas.
+
+    Args:
+        threshold (float): Minimum cosine similarity for a hit
+        max_entries (int): Prompts kept per schema and backend; 0 disables the cache
+        max_schemas (int): Schema indexes kept before the least recently used is dropped
+    """
+
+    def __init__(self, threshold=0.9, max_entries=512, max_schemas=16):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_schemas = max_schemas
+        self._lock = threading.Lock()
+        self._indexes = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._guard_rejections = 0
+
+    def _prepare(self, prompt, schema, backend):
+        tokens = prompt_tokens(prompt)
+        guard = literal_guard(tokens, schema_identifiers(schema))
+        return (schema_fingerprint(schema), backend), embed_tokens(tokens), guard
+
+    def get(self, prompt, schema, backend):
+        """Return a cached query for a prompt close enough to ``prompt``, else None."""
+        if self.max_entries <= 0:
+            return None
+        key, vector, guard = self._prepare(prompt, schema, backend)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is None:
+                self._misses += 1
+                return None
+            self._indexes.move_to_end(key)
+            slot, score = index.search(vector, guard, self.threshold)
+            if slot is None:
+                self._misses += 1
+                if score >= self.threshold:
+                    self._guard_rejections += 1
+                return None
+            self._hits += 1
+            return index.queries[slot]
+
+    def put(self, prompt, schema, backend, query):
+        if self.max_entries <= 0:
+            return
+        key, vector, guard = self._prepare(prompt, schema, backend)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is None:
+                index = self._indexes[key] = SemanticIndex(self.max_entries)
+                while len(self._indexes) > self.max_schemas:
+                    self._indexes.popitem(last=False)
+            self._indexes.move_to_end(key)
+            index.add(vector, guard, query)
+
+    def discard(self, prompt, schema, backend):
+        """Forget the entry that ``prompt`` would be served from, e.g. after its query failed."""
+        if self.max_entries <= 0:
+            return
+        key, vector, guard = self._prepare(prompt, schema, backend)
+        with self._lock:
+            index = self._indexes.get(key)
+            if index is not None:
+                slot, _ = index.search(vector, guard, self.threshold)
+                if slot is not None:
+                    index.remove(slot)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "indexes": len(self._indexes),
+                "entries": sum(len(index) for index in self._indexes.values()),
+                "hits": self._hits,
+                "misses": self._misses,
+                "guard_rejections": self._guard_rejections,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "threshold": self.threshold,
+            }
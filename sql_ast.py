@@ -0,0 +1,807 @@
+import re
+from collections import namedtuple
+
+
+class SQLTranslationError(ValueError):
+    """Raised when SQL cannot be parsed or has no pipeline equivalent; ``position`` is a character offset."""
+
+    def __init__(self, message, position=None):
+        if position is not None:
+            message = f"{message} at offset {position}"
+        super().__init__(message)
+        self.position = position
+
+
+KEYWORDS = {
+    "SELECT", "DISTINCT", "FROM", "WHERE", "AND", "OR", "NOT", "IN", "IS", "NULL", "LIKE", "BETWEEN",
+    "JOIN", "INNER", "LEFT", "OUTER", "ON", "GROUP", "BY", "HAVING", "ORDER", "ASC", "DESC", "LIMIT",
+    "OFFSET", "AS", "TRUE", "FALSE",
+}
+AGGREGATE_FUNCTIONS = {"COUNT", "SUM", "AVG", "MIN", "MAX"}
+
+TOKEN_PATTERN = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<number>\d+(?:\.\d+)?|\.\d+)
+  | (?P<string>'(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*")
+  | (?P<quoted>`(?:[^`]|``)+`)
+  | (?P<word>[^\W\d]\w*)
+  | (?P<op><>|!=|>=|<=|=|<|>)
+  | (?P<punct>[(),.*;+\-/%])
+""", re.VERBOSE)
+STRING_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "0": "\0"}
+
+Token = namedtuple("Token", "kind value position")
+
+# AST nodes. Expressions:
+Column = namedtuple("Column", "table name")
+Literal = namedtuple("Literal", "value")
+Aggregate = namedtuple("Aggregate", "function argument distinct")  # argument is None for COUNT(*)
+BinaryOp = namedtuple("BinaryOp", "op left right")
+# Conditions:
+Comparison = namedtuple("Comparison", "op left right")
+Between = namedtuple("Between", "expression low high negated")
+InList = namedtuple("InList", "expression values negated")
+Like = namedtuple("Like", "expression pattern negated")
+IsNull = namedtuple("IsNull", "expression negated")
+BoolOp = namedtuple("BoolOp", "op operands")
+Not = namedtuple("Not", "operand")
+# Statement:
+SelectItem = namedtuple("SelectItem", "expression alias")
+TableRef = namedtuple("TableRef", "name alias")
+Join = namedtuple("Join", "table kind left right")
+OrderItem = namedtuple("OrderItem", "expression descending")
+Select = namedtuple("Select", "distinct items table joins where group_by having order_by limit offset")
+
+COMPARISON_OPERATORS = {"=": "$eq", "!=": "$ne", "<>": "$ne", ">": "$gt", ">=": "$gte", "<": "$lt", "<=": "$lte"}
+FLIPPED_OPERATORS = {"=": "=", "!=": "!=", "<>": "<>", ">": "<", ">=": "<=", "<": ">", "<=": ">="}
+ARITHMETIC_OPERATORS = {"+": "$add", "-": "$subtract", "*": "$multiply", "/": "$divide", "%": "$mod"}
+
+
+def _unquote(text):
+    quote = text[0]
+    return re.sub(
+        r"\\(.)|" + quote * 2,
+        lambda m: STRING_ESCAPES.get(m.group(1), m.group(1)) if m.group(1) is not None else quote,
+        text[1:-1],
+        flags=re.DOTALL,
+    )
+
+
+def tokenize(sql):
+    """
+    Split SQL into tokens in a single left-to-right pass.
+
+    Words that are SQL keywords become "keyword" tokens (upper-cased); other
+    words and backtick-quoted names become "ident" tokens.
+    """
+    tokens = []
+    position = 0
+    while position < len(sql):
+        match = TOKEN_PATTERN.match(sql, position)
+        if match is None:
+            raise SQLTranslationError(f"Unexpected character {sql[position]!r}", position)
+        kind, text = match.lastgroup, match.group()
+        if kind == "word":
+            if text.upper() in KEYWORDS:
+                tokens.append(Token("keyword", text.upper(), position))
+            else:
+                tokens.append(Token("ident", text, position))
+        elif kind == "quoted":
+            tokens.append(Token("ident", text[1:-1].replace("``", "`"), position))
+        elif kind == "string":
+            tokens.append(Token("string", _unquote(text), position))
+        elif kind == "number":
+            tokens.append(Token("number", float(text) if "." in text else int(text), position))
+        elif kind != "space":
+            tokens.append(Token(kind, text, position))
+        position = match.end()
+    tokens.append(Token("end", None, len(sql)))
+    return tokens
+
+
+class Parser:
+    """Recursive-descent parser for the SELECT subset emitted by the translators."""
+
+    def __init__(self, sql):
+        self.tokens = tokenize(sql)
+        self.index = 0
+
+    def peek(self, offset=0):
+        return self.tokens[min(self.index + offset, len(self.tokens) - 1)]
+
+    def accept(self, kind, value=None):
+        token = self.peek()
+        if token.kind == kind and (value is None or token.value == value):
+            self.index += 1
+            return token
+        return None
+
+    def accept_keyword(self, word):
+        return self.accept("keyword", word)
+
+    def expect(self, kind, value=None):
+        token = self.accept(kind, value)
+        if token is None:
+            raise self.error(f"Expected {value or kind}")
+        return token
+
+    def error(self, message):
+        token = self.peek()
+        found = "end of query" if token.kind == "end" else repr(token.value)
+        return SQLTranslationError(f"{message}, found {found}", token.position)
+
+    def parse(self):
+        self.expect("keyword", "SELECT")
+        distinct = bool(self.accept_keyword("DISTINCT"))
+        items = None if self.accept("punct", "*") else self.parse_select_items()
+        self.expect("keyword", "FROM")
+        table = self.parse_table_ref()
+
+        joins = []
+        kind = self.parse_join_kind()
+        while kind:
+            joined = self.parse_table_ref()
+            self.expect("keyword", "ON")
+            left = self.parse_column()
+            self.expect("op", "=")
+            joins.append(Join(joined, kind, left, self.parse_column()))
+            kind = self.parse_join_kind()
+
+        where = self.parse_condition() if self.accept_keyword("WHERE") else None
+        group_by = []
+        if self.accept_keyword("GROUP"):
+            self.expect("keyword", "BY")
+            group_by = self.parse_list(self.parse_expression)
+        having = self.parse_condition() if self.accept_keyword("HAVING") else None
+        order_by = []
+        if self.accept_keyword("ORDER"):
+            self.expect("keyword", "BY")
+            order_by = self.parse_list(self.parse_order_item)
+
+        limit = offset = None
+        if self.accept_keyword("LIMIT"):
+            limit = self.expect("number").value
+            if self.accept("punct", ","):
+                offset, limit = limit, self.expect("number").value
+            elif self.accept_keyword("OFFSET"):
+                offset = self.expect("number").value
+
+        self.accept("punct", ";")
+        if self.peek().kind != "end":
+            raise self.error("Unexpected token")
+        return Select(distinct, items, table, joins, where, group_by, having, order_by, limit, offset)
+
+    def parse_list(self, parse_item):
+        items = [parse_item()]
+        while self.accept("punct", ","):
+            items.append(parse_item())
+        return items
+
+    def parse_select_items(self):
+        def parse_item():
+            expression = self.parse_expression()
+            alias = None
+            if self.accept_keyword("AS"):
+                alias = self.accept("string") or self.expect("ident")
+            else:
+                alias = self.accept("ident")
+            return SelectItem(expression, alias.value if alias else None)
+        return self.parse_list(parse_item)
+
+    def parse_table_ref(self):
+        name = self.expect("ident").value
+        alias = self.expect("ident") if self.accept_keyword("AS") else self.accept("ident")
+        return TableRef(name, alias.value if alias else None)
+
+    def parse_join_kind(self):
+        if self.accept_keyword("JOIN"):
+            return "inner"
+        if self.accept_keyword("INNER"):
+            self.expect("keyword", "JOIN")
+            return "inner"
+        if self.accept_keyword("LEFT"):
+            self.accept_keyword("OUTER")
+            self.expect("keyword", "JOIN")
+            return "left"
+        return None
+
+    def parse_column(self):
+        name = self.expect("ident").value
+        if self.accept("punct", "."):
+            return Column(name, self.expect("ident").value)
+        return Column(None, name)
+
+    def parse_order_item(self):
+        expression = self.parse_expression()
+        descending = bool(self.accept_keyword("DESC"))
+        if not descending:
+            self.accept_keyword("ASC")
+        return OrderItem(expression, descending)
+
+    def parse_expression(self):
+        left = self.parse_term()
+        while self.peek().kind == "punct" and self.peek().value in "+-":
+            op = self.tokens[self.index].value
+            self.index += 1
+            left = BinaryOp(op, left, self.parse_term())
+        return left
+
+    def parse_term(self):
+        left = self.parse_factor()
+        while self.peek().kind == "punct" and self.peek().value in "*/%":
+            op = self.tokens[self.index].value
+            self.index += 1
+            left = BinaryOp(op, left, self.parse_factor())
+        return left
+
+    def parse_factor(self):
+        token = self.peek()
+        if token.kind in ("number", "string"):
+            self.index += 1
+            return Literal(token.value)
+        if token.kind == "keyword" and token.value in ("NULL", "TRUE", "FALSE"):
+            self.index += 1
+            return Literal({"NULL": None, "TRUE": True, "FALSE": False}[token.value])
+        if self.accept("punct", "-"):
+            operand = self.parse_factor()
+            if isinstance(operand, Literal) and isinstance(operand.value, (int, float)):
+                return Literal(-operand.value)
+            return BinaryOp("-", Literal(0), operand)
+        if self.accept("punct", "("):
+            expression = self.parse_expression()
+            self.expect("punct", ")")
+            return expression
+        if token.kind == "ident" and self.peek(1).kind == "punct" and self.peek(1).value == "(":
+            function = token.value.upper()
+            if function not in AGGREGATE_FUNCTIONS:
+                raise SQLTranslationError(f"Unsupported function {token.value}", token.position)
+            self.index += 2
+            distinct = bool(self.accept_keyword("DISTINCT"))
+            if function == "COUNT" and not distinct and self.accept("punct", "*"):
+                argument = None
+            else:
+                argument = self.parse_expression()
+            self.expect("punct", ")")
+            return Aggregate(function, argument, distinct)
+        if token.kind == "ident":
+            return self.parse_column()
+        raise self.error("Expected an expression")
+
+    def parse_condition(self):
+        operands = [self.parse_conjunction()]
+        while self.accept_keyword("OR"):
+            operands.append(self.parse_conjunction())
+        return operands[0] if len(operands) == 1 else BoolOp("OR", operands)
+
+    def parse_conjunction(self):
+        operands = [self.parse_negation()]
+        while self.accept_keyword("AND"):
+            operands.append(self.parse_negation())
+        return operands[0] if len(operands) == 1 else BoolOp("AND", operands)
+
+    def parse_negation(self):
+        if self.accept_keyword("NOT"):
+            return Not(self.parse_negation())
+        return self.parse_predicate()
+
+    def parse_predicate(self):
+        if self.peek().kind == "punct" and self.peek().value == "(":
+            # "(" opens either a nested condition or an arithmetic expression
+            # such as "(a + b) > 3"; try the condition first.
+            start = self.index
+            try:
+                self.index += 1
+                condition = self.parse_condition()
+                self.expect("punct", ")")
+                following = self.peek()
+                continues_expression = (
+                    following.kind == "op"
+                    or (following.kind == "punct" and following.value in "+-*/%")
+                    or (following.kind == "keyword" and following.value in ("NOT", "BETWEEN", "IN", "LIKE", "IS"))
+                )
+                if not continues_expression:
+                    return condition
+            except SQLTranslationError:
+                pass
+            self.index = start
+
+        left = self.parse_expression()
+        negated = bool(self.accept_keyword("NOT"))
+        if self.accept_keyword("BETWEEN"):
+            low = self.parse_expression()
+            self.expect("keyword", "AND")
+            return Between(left, low, self.parse_expression(), negated)
+        if self.accept_keyword("IN"):
+            self.expect("punct", "(")
+            values = self.parse_list(self.parse_expression)
+            self.expect("punct", ")")
+            return InList(left, values, negated)
+        if self.accept_keyword("LIKE"):
+            return Like(left, self.parse_expression(), negated)
+        if negated:
+            raise self.error("Expected BETWEEN, IN or LIKE after NOT")
+        if self.accept_keyword("IS"):
+            negated = bool(self.accept_keyword("NOT"))
+            self.expect("keyword", "NULL")
+            return IsNull(left, negated)
+        op = self.accept("op")
+        if op is None:
+            raise self.error("Expected a comparison")
+        return Comparison(op.value, left, self.parse_expression())
+
+
+def parse_sql(sql):
+    """Parse one SELECT statement into a ``Select`` tree."""
+    return Parser(sql).parse()
+
+
+def walk(node):
+    """Yield ``node`` and every AST node nested in it."""
+    yield node
+    for value in node:
+        if isinstance(value, tuple):
+            yield from walk(value)
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, tuple):
+                    yield from walk(item)
+
+
+def conjuncts(condition):
+    if condition is None:
+        return []
+    if isinstance(condition, BoolOp) and condition.op == "AND":
+        return [part for operand in condition.operands for part in conjuncts(operand)]
+    return [condition]
+
+
+def like_to_regex(pattern):
+    """Translate a SQL LIKE pattern into an anchored regex, dropping anchors next to a leading/trailing %."""
+    parts = []
+    escaped = False
+    for char in pattern:
+        if escaped:
+            parts.append(re.escape(char))
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == "%":
+            if not parts or parts[-1] != ".*":
+                parts.append(".*")
+        elif char == "_":
+            parts.append(".")
+        else:
+            parts.append(re.escape(char))
+    if parts == [".*"]:
+        return ""
+    prefix, suffix = "^", "$"
+    if parts and parts[0] == ".*":
+        prefix, parts = "", parts[1:]
+    if parts and parts[-1] == ".*":
+        suffix, parts = "", parts[:-1]
+    return prefix + "".join(parts) + suffix
+
+
+def merge_match(documents):
+    """Combine $match documents with AND, nesting in $and only when keys collide."""
+    merged = {}
+    for document in documents:
+        if merged.keys() & document.keys():
+            return {"$and": documents}
+        merged.update(document)
+    return merged
+
+
+def is_range(node):
+    """True for MAX(x) - MIN(x)."""
+    return (isinstance(node, BinaryOp) and node.op == "-" and isinstance(node.left, Aggregate)
+            and node.left == Aggregate("MAX", node.left.argument, False)
+            and node.right == Aggregate("MIN", node.left.argument, False))
+
+
+class PipelineCompiler:
+    """
+    Compile a ``Select`` tree into a MongoDB aggregation pipeline.
+
+    Joins become ``$lookup`` + ``$unwind`` on the joined table's name (or
+    alias), so its fields are addressed as ``<table>.<field>``. WHERE
+    conjuncts are placed right after the last join they need, so filters on
+    the base collection run before any ``$lookup``. ``$sort``, ``$skip`` and
+    ``$limit`` come before the single final ``$project`` whenever the sort
+    keys allow it.
+
+    Args:
+        select (Select): Parsed statement
+        schema (dict): Optional table -> column names, used to resolve unqualified columns
+    """
+
+    def __init__(self, select, schema=None):
+        self.select = select
+        self.schema = {
+            table: {column["name"] if isinstance(column, dict) else column for column in columns}
+            for table, columns in (schema or {}).items()
+        }
+        base = select.table
+        # (table name, path prefix) per source; the base collection has no prefix.
+        self.sources = [(base.name, "")]
+        self.source_names = {base.name: 0}
+        if base.alias:
+            self.source_names[base.alias] = 0
+        for join in select.joins:
+            prefix = join.table.alias or join.table.name
+            if prefix in self.source_names:
+                raise SQLTranslationError(f"Table {prefix} appears twice; give it an alias")
+            self.source_names[prefix] = len(self.sources)
+            self.source_names.setdefault(join.table.name, len(self.sources))
+            self.sources.append((join.table.name, prefix))
+        self.group_keys = {}
+        self.aliases = {}
+        self.accumulators = {}
+        self.accumulator_refs = {}
+        # Argument of the query's COUNT(DISTINCT ...), when it is counted with a second $group.
+        self.distinct_argument = None
+
+    # Column resolution
+
+    def source_of(self, column):
+        if column.table is not None:
+            if column.table in self.source_names:
+                return self.source_names[column.table]
+            for name, index in self.source_names.items():
+                if name.lower() == column.table.lower():
+                    return index
+            raise SQLTranslationError(f"Unknown table {column.table}")
+        for index, (table, _) in enumerate(self.sources):
+            if column.name in self.schema.get(table, ()):
+                return index
+        return 0
+
+    def path(self, column):
+        prefix = self.sources[self.source_of(column)][1]
+        return f"{prefix}.{column.name}" if prefix else column.name
+
+    def is_known_column(self, column):
+        return column.table is not None or not self.schema or any(
+            column.name in columns for columns in self.schema.values()
+        )
+
+    def level(self, node):
+        """Index of the last source a condition reads from (0 = base collection)."""
+        return max((self.source_of(n) for n in walk(node) if isinstance(n, Column)), default=0)
+
+    # Expressions
+
+    def expression(self, node, grouped=False):
+        if grouped and node in self.group_keys:
+            return f"$_id.{self.group_keys[node]}"
+        if isinstance(node, Column):
+            if grouped and node.table is None and node.name in self.aliases:
+                return self.expression(self.aliases[node.name], grouped)
+            if grouped:
+                raise SQLTranslationError(f"Column {node.name} must appear in GROUP BY or inside an aggregate")
+            return f"${self.path(node)}"
+        if isinstance(node, Literal):
+            if isinstance(node.value, str) and node.value.startswith("$"):
+                return {"$literal": node.value}
+            return node.value
+        if isinstance(node, BinaryOp):
+            return {ARITHMETIC_OPERATORS[node.op]: [self.expression(node.left, grouped),
+                                                    self.expression(node.right, grouped)]}
+        if isinstance(node, Aggregate):
+            if not grouped:
+                raise SQLTranslationError("Aggregate functions are not allowed here")
+            return self.accumulator(node)
+        raise SQLTranslationError(f"Unsupported expression {type(node).__name__}")
+
+    def condition_expression(self, node, grouped=False):
+        """Translate a condition into a boolean aggregation expression (for $expr)."""
+        if isinstance(node, BoolOp):
+            return {f"${node.op.lower()}": [self.condition_expression(o, grouped) for o in node.operands]}
+        if isinstance(node, Not):
+            return {"$not": [self.condition_expression(node.operand, grouped)]}
+        if isinstance(node, Comparison):
+            return {COMPARISON_OPERATORS[node.op]: [self.expression(node.left, grouped),
+                                                    self.expression(node.right, grouped)]}
+        value = self.expression(node.expression, grouped)
+        if isinstance(node, Between):
+            result = {"$and": [{"$gte": [value, self.expression(node.low, grouped)]},
+                               {"$lte": [value, self.expression(node.high, grouped)]}]}
+        elif isinstance(node, InList):
+            result = {"$in": [value, [self.expression(v, grouped) for v in node.values]]}
+        elif isinstance(node, Like):
+            if not isinstance(node.pattern, Literal):
+                raise SQLTranslationError("LIKE needs a string pattern")
+            result = {"$regexMatch": {"input": value, "regex": like_to_regex(str(node.pattern.value)), "options": "i"}}
+        elif isinstance(node, IsNull):
+            result = {"$eq": [{"$ifNull": [value, None]}, None]}
+            return {"$not": [result]} if node.negated else result
+        else:
+            raise SQLTranslationError(f"Unsupported condition {type(node).__name__}")
+        return {"$not": [result]} if node.negated else result
+
+    # $match documents
+
+    def match_document(self, node):
+        if isinstance(node, BoolOp):
+            documents = [self.match_document(operand) for operand in node.operands]
+            return merge_match(documents) if node.op == "AND" else {"$or": documents}
+        if isinstance(node, Not):
+            return {"$nor": [self.match_document(node.operand)]}
+        if isinstance(node, Comparison):
+            left, op, right = node.left, node.op, node.right
+            if isinstance(left, Literal) and isinstance(right, Column):
+                left, op, right = right, FLIPPED_OPERATORS[op], left
+            if isinstance(left, Column) and isinstance(right, Column) and not self.is_known_column(right):
+                # An unquoted word that is not a column of the schema (WHERE Grade = A).
+                right = Literal(right.name)
+            if isinstance(left, Column) and isinstance(right, Literal):
+                if op == "=":
+                    return {self.path(left): right.value}
+                return {self.path(left): {COMPARISON_OPERATORS[op]: right.value}}
+            return {"$expr": self.condition_expression(node)}
+
+        column = node.expression
+        if not isinstance(column, Column):
+            return {"$expr": self.condition_expression(node)}
+        path = self.path(column)
+        if isinstance(node, IsNull):
+            # The predicates of the old IS [NOT] NULL rules.
+            return {path: {"$exists": True, "$ne": None}} if node.negated else {path: {"$eq": None}}
+        if isinstance(node, Between) and isinstance(node.low, Literal) and isinstance(node.high, Literal):
+            document = {path: {"$gte": node.low.value, "$lte": node.high.value}}
+            return {"$nor": [document]} if node.negated else document
+        if isinstance(node, InList) and all(isinstance(v, Literal) for v in node.values):
+            return {path: {"$nin" if node.negated else "$in": [v.value for v in node.values]}}
+        if isinstance(node, Like) and isinstance(node.pattern, Literal):
+            regex = {"$regex": like_to_regex(str(node.pattern.value)), "$options": "i"}
+            return {path: {"$not": regex}} if node.negated else {path: regex}
+        return {"$expr": self.condition_expression(node)}
+
+    # Aggregation
+
+    def accumulator(self, aggregate, name=None):
+        """Register an accumulator for ``aggregate`` and return the expression that reads it after $group."""
+        if aggregate in self.accumulator_refs:
+            return self.accumulator_refs[aggregate]
+        function = aggregate.function.lower()
+        if name is None:
+            name = f"{function}_value"
+        if name in self.accumulators or name == "_id":
+            name = f"agg{len(self.accumulators)}"
+        if aggregate.argument is None:
+            self.accumulators[name] = {"$sum": 1}
+            reference = f"${name}"
+        elif aggregate.distinct and aggregate.argument == self.distinct_argument:
+            self.accumulators[name] = {"$sum": {"$cond": [{"$eq": [{"$ifNull": ["$_id._value", None]}, None]}, 0, 1]}}
+            reference = f"${name}"
+        elif aggregate.distinct:
+            self.accumulators[name] = {"$addToSet": self.expression(aggregate.argument)}
+            reference = {"$size": f"${name}"} if function == "count" else {f"${function}": f"${name}"}
+        elif function == "count":
+            argument = self.expression(aggregate.argument)
+            self.accumulators[name] = {"$sum": {"$cond": [{"$eq": [{"$ifNull": [argument, None]}, None]}, 0, 1]}}
+            reference = f"${name}"
+        else:
+            self.accumulators[name] = {f"${function}": self.expression(aggregate.argument)}
+            reference = f"${name}"
+        self.accumulator_refs[aggregate] = reference
+        return reference
+
+    def output_names(self):
+        """
+        Result keys of the select list.
+
+        Unaliased expressions keep the keys of the old SQL rules, which the UI
+        already shows: ``count`` or, with a WHERE clause, ``total_count`` for
+        COUNT(*), and ``difference`` for MAX(x) - MIN(x).
+        """
+        names = []
+        for position, item in enumerate(self.select.items or []):
+            expression = item.expression
+            if item.alias:
+                name = item.alias
+            elif expression == Aggregate("COUNT", None, False):
+                name = "count" if self.select.where is None else "total_count"
+            elif is_range(expression):
+                name = "difference"
+            elif isinstance(expression, Column):
+                name = expression.name
+                if name in names:
+                    name = f"{self.sources[self.source_of(expression)][1] or self.sources[0][0]}_{name}"
+            elif isinstance(expression, Aggregate):
+                argument = expression.argument
+                name = expression.function.lower()
+                if isinstance(argument, Column):
+                    name = f"{name}_{argument.name}"
+            else:
+                name = f"expr{position}"
+            if name in names:
+                name = f"{name}_{position}"
+            names.append(re.sub(r"[.$]", "_", name))
+        return names
+
+    def resolve_reference(self, expression, names):
+        """Map ORDER BY / GROUP BY positions (ORDER BY 2) and select aliases to their expressions."""
+        items = self.select.items or []
+        if isinstance(expression, Literal) and isinstance(expression.value, int):
+            if not 1 <= expression.value <= len(items):
+                raise SQLTranslationError(f"Position {expression.value} is not in the select list")
+            return items[expression.value - 1].expression
+        if isinstance(expression, Column) and expression.table is None and expression.name in names:
+            item = items[names.index(expression.name)]
+            if item.alias == expression.name:
+                return item.expression
+        return expression
+
+    def is_aggregate_query(self):
+        select = self.select
+        nodes = [item.expression for item in select.items or []] + [o.expression for o in select.order_by]
+        return bool(select.group_by or select.distinct or select.having is not None or any(
+            isinstance(n, Aggregate) for node in nodes for n in walk(node)
+        ))
+
+    def compile(self):
+        """
+        Returns:
+            tuple: (collection name, pipeline as a list of stage dicts)
+        """
+        select = self.select
+        pending = [(self.level(c), c) for c in conjuncts(select.where)]
+        if any(isinstance(n, Aggregate) for c in pending for n in walk(c[1])):
+            raise SQLTranslationError("Aggregate functions are not allowed in WHERE; use HAVING")
+
+        stages = []
+
+        def add_filters(level):
+            documents = [self.match_document(c) for lvl, c in pending if lvl == level]
+            if documents:
+                stages.append({"$match": merge_match(documents)})
+
+        add_filters(0)
+        for index, join in enumerate(select.joins, 1):
+            left, right = join.left, join.right
+            if self.source_of(left) == index:
+                left, right = right, left
+            if self.source_of(right) != index or self.source_of(left) >= index:
+                raise SQLTranslationError(f"Join condition for {join.table.name} must compare it with an earlier table")
+            prefix = self.sources[index][1]
+            stages.append({"$lookup": {"from": join.table.name, "localField": self.path(left),
+                                       "foreignField": right.name, "as": prefix}})
+            if join.kind == "left":
+                stages.append({"$unwind": {"path": f"${prefix}", "preserveNullAndEmptyArrays": True}})
+            else:
+                stages.append({"$unwind": f"${prefix}"})
+            add_filters(index)
+
+        names = self.output_names()
+        if self.is_aggregate_query():
+            stages += self.compile_grouped(names)
+        else:
+            stages += self.compile_plain(names)
+        return select.table.name, stages
+
+    def window_stages(self):
+        stages = []
+        if self.select.offset:
+            stages.append({"$skip": self.select.offset})
+        if self.select.limit is not None:
+            stages.append({"$limit": self.select.limit})
+        return stages
+
+    def compile_plain(self, names):
+        select = self.select
+        project = {}
+        for name, item in zip(names, select.items or []):
+            expression = item.expression
+            if isinstance(expression, Column) and self.path(expression) == name:
+                project[name] = 1
+            else:
+                project[name] = self.expression(expression)
+        if project and "_id" not in project:
+            project["_id"] = 0
+
+        sort = {}
+        after_project = False
+        for order in select.order_by:
+            expression = self.resolve_reference(order.expression, names)
+            if isinstance(expression, Column):
+                sort[self.path(expression)] = -1 if order.descending else 1
+            elif expression in [item.expression for item in select.items or []]:
+                after_project = True
+            else:
+                raise SQLTranslationError("ORDER BY expressions must be columns or select-list entries")
+        if after_project:
+            # Sort on the projected names instead, since some keys only exist there.
+            sort = {}
+            for order in select.order_by:
+                expression = self.resolve_reference(order.expression, names)
+                items = [item.expression for item in select.items]
+                if expression not in items:
+                    raise SQLTranslationError("ORDER BY mixes computed and unselected columns")
+                sort[names[items.index(expression)]] = -1 if order.descending else 1
+
+        sort_stages = [{"$sort": sort}] if sort else []
+        project_stages = [{"$project": project}] if project else []
+        if after_project:
+            return project_stages + sort_stages + self.window_stages()
+        return sort_stages + self.window_stages() + project_stages
+
+    def compile_grouped(self, names):
+        select = self.select
+        items = select.items
+        if items is None:
+            raise SQLTranslationError("SELECT * cannot be combined with GROUP BY or aggregates")
+
+        self.aliases = {item.alias: item.expression for item in items if item.alias}
+        group_by = [self.resolve_reference(e, names) for e in select.group_by]
+        if select.distinct:
+            group_by += [item.expression for item in items if item.expression not in group_by]
+        for expression in group_by:
+            key = re.sub(r"[.$]", "_", self.path(expression)) if isinstance(expression, Column) else f"key{len(self.group_keys)}"
+            self.group_keys[expression] = key
+
+        single = len(items) == 1 and not group_by and select.having is None and not select.order_by and not select.offset
+        expression = items[0].expression
+        if single and expression == Aggregate("COUNT", None, False):
+            return [{"$count": names[0]}]
+        if single and isinstance(expression, Aggregate) and expression.function == "COUNT" and expression.distinct:
+            # One group per value, then count the groups, rather than $addToSet
+            # building every distinct value into one document.
+            return [{"$group": {"_id": self.expression(expression.argument)}}, {"$count": names[0]}]
+
+        nodes = [item.expression for item in items] + [self.resolve_reference(o.expression, names) for o in select.order_by]
+        if select.having is not None:
+            nodes.append(select.having)
+        aggregates = {n for node in nodes for n in walk(node) if isinstance(n, Aggregate)}
+        if (aggregates and all(a.function == "COUNT" and a.distinct for a in aggregates)
+                and len({a.argument for a in aggregates}) == 1):
+            self.distinct_argument = next(iter(aggregates)).argument
+
+        project = {}
+        for name, item in zip(names, items):
+            expression = item.expression
+            if isinstance(expression, Aggregate) and expression not in self.accumulator_refs:
+                self.accumulator(expression, name)
+            project[name] = self.expression(expression, grouped=True)
+
+        having = [{"$match": {"$expr": self.condition_expression(select.having, grouped=True)}}] if select.having else []
+
+        sort = {}
+        for order in select.order_by:
+            expression = self.resolve_reference(order.expression, names)
+            reference = self.expression(expression, grouped=True)
+            if not isinstance(reference, str) or not reference.startswith("$"):
+                raise SQLTranslationError("ORDER BY expressions must be grouped columns or aggregates")
+            sort[reference[1:]] = -1 if order.descending else 1
+
+        keys = {key: self.expression(e) for e, key in self.group_keys.items()}
+        stages = []
+        if self.distinct_argument is not None:
+            # Group once per (keys, value), then count those groups per key.
+            stages.append({"$group": {"_id": {**keys, "_value": self.expression(self.distinct_argument)}}})
+            keys = {key: f"$_id.{key}" for key in keys}
+        group = {"_id": keys or None}
+        group.update(self.accumulators)
+        for name, value in project.items():
+            if value == f"${name}":
+                project[name] = 1
+        project["_id"] = 0
+        return (stages + [{"$group": group}] + having + ([{"$sort": sort}] if sort else [])
+                + self.window_stages() + [{"$project": project}])
+
+
+def translate_sql(sql, schema=None):
+    """
+    Translate one SELECT statement into a MongoDB aggregation.
+
+    Args:
+        sql (str): SQL such as the output of ``query_function_sql``
+        schema (dict): Optional table -> column names for resolving unqualified columns
+
+    Returns:
+        tuple: (collection name, pipeline)
+
+    Raises:
+        SQLTranslationError: If the SQL cannot be parsed or has no pipeline equivalent
+    """
+    return PipelineCompiler(parse_sql(sql), schema).compile()
@@ -51,7 +51,7 @@ sendBtn.addEventListener('click', () => {
     fetch("/api/sample-queries", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ operation: operation, db: activeTab })
+        body: JSON.stringify({ operation: operation, db: activeTab, db_name: currDatabase })
     })
         .then(response => response.json())
         .then(data => {
@@ -110,6 +110,32 @@ function addMessage(text, className) {
     msg.classList.add('message', className);
     messages.appendChild(msg);
     messages.scrollTop = messages.scrollHeight;
+    return msg;
+}
+
+async function pollUploadJob(statusUrl, progressMessage, dbName) {
+  while (true) {
+    await new Promise(resolve => setTimeout(resolve, 1000));
+    const response = await fetch(statusUrl);
+    if (!response.ok) {
+      throw new Error('Failed to fetch upload status');
+    }
+
+    const job = await response.json();
+    if (job.status === 'completed' || job.status === 'failed') {
+      return job;
+    }
+
+    const done = job.files.filter(file => file.status !== 'queued' && file.status !== 'running').length;
+    let text = `Uploading "${dbName}": ${done}/${job.files.length} files, ${job.rows_processed} rows`;
+    if (job.rows_per_sec) {
+      text += `, ${Math.round(job.rows_per_sec)} rows/s`;
+    }
+    if (job.eta_sec !== null) {
+      text += `, ~${Math.ceil(job.eta_sec)}s left`;
+    }
+    progressMessage.textContent = text;
+  }
 }
 
 
@@ -187,34 +213,36 @@ uploadFileInput.addEventListener('change', async () => {
   addMessage(`Processing folder "${dbName}" with ${csvCount} CSV files...`, 'bot-message');
 
   try {
-    if (activeTab == 'mongodb') {
-      const response = await fetch('api/upload-mongodb', {
-        method: 'POST',
-        body: formData,
-      });
-      
-      if (!response.ok) {
-        throw new Error('Failed to upload files');
-      }
+    const endpoint = activeTab == 'mongodb' ? 'api/upload-mongodb' : 'api/upload-mysql';
+    const response = await fetch(endpoint, {
+      method: 'POST',
+      body: formData,
+    });
 
-      const data = await response.json();
-      addMessage(data.message || `Successfully uploaded ${csvCount} tables to database "${dbName}"`, 'bot-message');
+    if (!response.ok) {
+      throw new Error('Failed to upload files');
     }
 
-    else {
-      const response = await fetch('api/upload-mysql', {
-        method: 'POST',
-        body: formData,
-        });
-      
-      if (!response.ok) {
-        throw new Error('Failed to upload files');
-      }
-
-      const data = await response.json();
+    const data = await response.json();
+    if (!data.job_id) {
       addMessage(data.message || `Successfully uploaded ${csvCount} tables to database "${dbName}"`, 'bot-message');
+      return;
+    }
 
-  }
+    const progressMessage = addMessage(`Upload of "${dbName}" queued...`, 'bot-message');
+    const job = await pollUploadJob(data.status_url, progressMessage, dbName);
+
+    if (job.status === 'failed') {
+      throw new Error(job.error || 'Upload job failed');
+    }
+    progressMessage.textContent = `Upload process completed to database: ${dbName} (${job.rows_processed} rows in ${job.elapsed_sec}s)`;
+    job.results.forEach(result => {
+      if (result && result.status === 'error') {
+        addMessage(`Error in ${result.filename}: ${result.message}`, 'bot-message');
+      } else if (result && result.status === 'partial') {
+        addMessage(`${result.filename}: ${result.rows_failed} rows could not be inserted`, 'bot-message');
+      }
+    });
   } catch (err) {
     addMessage(`Error: Could not upload tables to database "${dbName}".`, 'bot-message');
     console.error(err);
@@ -0,0 +1,16 @@
+from cache import TranslationCache
+
+SCHEMA = {"students": ["StudentID", "FirstName"]}
+
+
+def test_empty_translations_are_not_cached():
+    cache = TranslationCache()
+    key = TranslationCache.key("show FirstName", SCHEMA, "sql", 1)
+    answers = iter(["", None, "SELECT FirstName FROM students"])
+
+    assert cache.get(key, lambda: next(answers)) == ""
+    assert cache.get(key, lambda: next(answers)) is None
+    assert cache.get(key, lambda: next(answers)) == "SELECT FirstName FROM students"
+    assert cache.get(key, lambda: next(answers)) == "SELECT FirstName FROM students"
+    assert cache.stats()["entries"] == 1
+    assert cache.stats()["hits"] == 1
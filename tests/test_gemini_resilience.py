@@ -0,0 +1,138 @@
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+import gemini
+from gemini import CircuitBreaker, LLMUnavailableError, QueryER, llm_deadline
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(gemini, "time", clock)
+    return clock
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state() == "closed"
+
+    breaker.record_failure()
+    assert breaker.state() == "open"
+    assert not breaker.allow()
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_half_open_breaker_lets_one_trial_call_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+
+    assert breaker.state() == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state() == "closed"
+    assert breaker.allow()
+
+
+def test_failed_trial_call_reopens_the_breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state() == "open"
+    assert breaker.stats()["opened"] == 2
+    clock.now += 29
+    assert not breaker.allow()
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """Plays back ``script``: exceptions are raised, strings are returned as response text."""
+
+    def __init__(self, script):
+        self.script = list(script)
+        self.timeouts = []
+
+    def generate_content(self, prompt, request_options=None):
+        self.timeouts.append(request_options["timeout"])
+        step = self.script.pop(0)
+        if isinstance(step, Exception):
+            raise step
+        return FakeResponse(step)
+
+
+def translator(script, **options):
+    options.setdefault("breaker", CircuitBreaker(failure_threshold=3, reset_timeout=30))
+    translator = QueryER(**options)
+    translator.model = FakeModel(script)
+    return translator
+
+
+@pytest.fixture(autouse=True)
+def no_genai(monkeypatch):
+    monkeypatch.setattr(gemini, "configure_genai", lambda: None)
+    monkeypatch.setattr(gemini.genai, "GenerativeModel", lambda model_name: None)
+
+
+def test_transient_errors_are_retried_with_a_per_call_timeout(clock):
+    query_er = translator(
+        [google_exceptions.ServiceUnavailable("busy"), "no json", '{"sql": "SELECT 1"}'], timeout=5
+    )
+
+    assert query_er.decompose("q", "{}", "sql") == "SELECT 1"
+    assert query_er.model.timeouts == [5, 5, 5]
+    stats = query_er.stats()
+    assert (stats["calls"], stats["retries"], stats["errors"], stats["empty_responses"]) == (3, 2, 1, 1)
+
+
+def test_permanent_errors_are_not_retried(clock):
+    query_er = translator([google_exceptions.PermissionDenied("bad key")])
+
+    with pytest.raises(google_exceptions.PermissionDenied):
+        query_er.decompose("q", "{}", "sql")
+    assert query_er.stats()["calls"] == 1
+
+
+def test_open_breaker_fails_fast(clock):
+    query_er = translator([google_exceptions.DeadlineExceeded("slow")] * 3, max_attempts=5)
+
+    with pytest.raises(LLMUnavailableError):
+        query_er.decompose("q", "{}", "sql")
+    with pytest.raises(LLMUnavailableError):
+        query_er.decompose("q", "{}", "sql")
+    stats = query_er.stats()
+    assert stats["calls"] == 3
+    assert stats["timeouts"] == 3
+    assert stats["circuit"]["state"] == "open"
+
+
+def test_request_deadline_bounds_the_retries(clock):
+    query_er = translator(["no json"] * 5, timeout=20, budget=45, backoff_base=4, backoff_max=4)
+
+    with llm_deadline(6):
+        assert query_er.decompose("q", "{}", "sql") == ""
+    assert clock.now - 1000.0 <= 6
+    assert query_er.model.timeouts[0] == 6
+    assert query_er.stats()["budget_exhausted"] == 1
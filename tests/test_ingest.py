@@ -0,0 +1,101 @@
+import io
+
+import pytest
+
+from ingest import IngestError, insert_csv_mysql
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, query, args=None):
+        self.connection.calls.append(("execute", query))
+
+    def executemany(self, query, rows):
+        if self.connection.fail_on_insert:
+            raise RuntimeError("insert failed")
+        self.connection.calls.append(("executemany", rows))
+
+
+class FakeConnection:
+    """Records the statements and transaction calls an upload makes."""
+
+    def __init__(self, fail_on_insert=False):
+        self.fail_on_insert = fail_on_insert
+        self.calls = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def begin(self):
+        self.calls.append(("begin",))
+
+    def commit(self):
+        self.calls.append(("commit",))
+
+    def rollback(self):
+        self.calls.append(("rollback",))
+
+
+def csv_stream(text):
+    return io.BytesIO(text.encode("utf-8"))
+
+
+def call_names(connection):
+    return [call[0] for call in connection.calls]
+
+
+def test_inserts_run_inside_an_explicit_transaction():
+    connection = FakeConnection()
+    rows = insert_csv_mysql(connection, "grades", csv_stream("id,grade\n1,90\n2,80\n"))
+
+    assert rows == 2
+    # The connections are autocommit, so the inserts need their own transaction.
+    assert call_names(connection) == ["execute", "begin", "executemany", "commit"]
+
+
+def test_failed_insert_rolls_the_transaction_back():
+    connection = FakeConnection(fail_on_insert=True)
+    with pytest.raises(IngestError) as error:
+        insert_csv_mysql(connection, "grades", csv_stream("id,grade\n1,90\n"))
+
+    assert error.value.rows_committed == 0
+    assert call_names(connection) == ["execute", "begin", "rollback"]
+
+
+def executed_sql(connection):
+    return [call[1] for call in connection.calls if call[0] == "execute"]
+
+
+def test_column_types_come_from_the_sample_not_the_first_chunk():
+    # Chunk 1 has only numbers and nulls; the text and the numbers show up later.
+    text = "id,code,score\n1,10,\n2,20,\n3,abc,4.5\n4,40,7\n"
+    connection = FakeConnection()
+    insert_csv_mysql(connection, "t", csv_stream(text), chunksize=2, sample_rows=4)
+
+    assert executed_sql(connection) == [
+        "CREATE TABLE IF NOT EXISTS `t` (`id` INT, `code` VARCHAR(255), `score` FLOAT)"
+    ]
+
+
+def test_later_chunks_widen_conflicting_columns():
+    text = "id,code,note\n1,10,\n2,20,\n3,abc,\n4,40," + "x" * 300 + "\n"
+    connection = FakeConnection()
+    rows = insert_csv_mysql(connection, "t", csv_stream(text), chunksize=2, sample_rows=2)
+
+    assert rows == 4
+    assert executed_sql(connection) == [
+        "CREATE TABLE IF NOT EXISTS `t` (`id` INT, `code` INT, `note` FLOAT)",
+        "ALTER TABLE `t` MODIFY `code` VARCHAR(255), MODIFY `note` TEXT",
+    ]
+    # The ALTER commits implicitly, so the first chunk is committed before it.
+    assert call_names(connection) == [
+        "execute", "begin", "executemany", "commit", "execute", "begin", "executemany", "commit"
+    ]
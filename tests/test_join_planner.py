@@ -0,0 +1,44 @@
+from join_planner import join_graph_for
+from regex import query_function_sql
+
+SCHEMA = {
+    "students": ["StudentID", "FirstName", "Major"],
+    "enrollments": ["EnrollmentID", "StudentID", "CourseID", "Grade"],
+    "courses": ["CourseID", "CourseName"],
+    "advisors": ["AdvisorID", "StudentID", "AdvisorName"],
+}
+
+
+def joined_tables(sql):
+    return [line.split()[1] for line in sql.splitlines() if line.startswith("JOIN ")]
+
+
+def test_joins_are_ordered_by_row_count():
+    question = "find FirstName, CourseName, AdvisorName where Grade > 90"
+    small_advisors = query_function_sql(SCHEMA, question, row_counts={"advisors": 10, "enrollments": 50000})
+    small_enrollments = query_function_sql(SCHEMA, question, row_counts={"advisors": 50000, "enrollments": 10})
+
+    assert joined_tables(small_advisors) == ["advisors", "enrollments", "courses"]
+    assert joined_tables(small_enrollments) == ["enrollments", "courses", "advisors"]
+
+
+def test_declared_foreign_keys_connect_tables_without_shared_columns():
+    schema = {"courses": ["CourseID", "CourseName", "TeacherRef"], "instructors": ["InstructorID", "Name"]}
+    question = "find CourseName, Name where CourseID > 1"
+
+    assert query_function_sql(schema, question) is None
+    sql = query_function_sql(schema, question, foreign_keys=[("courses", "TeacherRef", "instructors", "InstructorID")])
+    assert "JOIN instructors ON courses.TeacherRef = instructors.InstructorID" in sql
+
+
+def test_graphs_are_cached_per_foreign_keys_and_row_counts():
+    assert join_graph_for(SCHEMA) is join_graph_for(dict(SCHEMA))
+    assert join_graph_for(SCHEMA, row_counts={"courses": 5}) is not join_graph_for(SCHEMA)
+    assert join_graph_for(SCHEMA, row_counts={"courses": 5}).row_counts == {"courses": 5}
+
+
+def test_stop_words_are_kept_in_the_condition():
+    sql = query_function_sql(SCHEMA, "find the FirstName, Grade where Grade = A and Major = an")
+
+    assert sql.startswith("SELECT students.FirstName, enrollments.Grade\n")
+    assert sql.endswith("\nWHERE Grade = A AND Major = an;")
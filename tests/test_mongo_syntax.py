@@ -0,0 +1,52 @@
+import datetime
+
+import pytest
+from bson import ObjectId
+from bson.regex import Regex
+
+from mongo_syntax import MongoSyntaxError, parse_mongo_query
+
+
+def test_shell_syntax_is_parsed():
+    text = """db.students.aggregate([
+        // filter first
+        { $match: { Major: 'CS', Grade: { $gte: 3.5 }, Active: true, Email: null, Name: /^a/i } },
+        { $sort: { FirstName: -1, }, },
+    ]).toArray();"""
+
+    assert parse_mongo_query(text) == ("students", [
+        {"$match": {"Major": "CS", "Grade": {"$gte": 3.5}, "Active": True, "Email": None, "Name": Regex("^a", "i")}},
+        {"$sort": {"FirstName": -1}},
+    ])
+
+
+def test_shell_helpers_become_bson_values():
+    _, pipeline = parse_mongo_query(
+        'db.getCollection("events").aggregate([{"$match": {"_id": ObjectId("65a1b2c3d4e5f60718293a4b"), '
+        '"at": {"$gte": ISODate("2024-01-02T03:04:05Z")}, "n": NumberLong(7)}}])'
+    )
+
+    assert pipeline == [{"$match": {
+        "_id": ObjectId("65a1b2c3d4e5f60718293a4b"),
+        "at": {"$gte": datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)},
+        "n": 7,
+    }}]
+
+
+def test_escaped_quotes_stay_inside_strings():
+    _, pipeline = parse_mongo_query(r'db.c.aggregate([{"$match": {"q": "say \"hi\", [ok]"}}])')
+
+    assert pipeline == [{"$match": {"q": 'say "hi", [ok]'}}]
+
+
+@pytest.mark.parametrize("text, position", [
+    ("db.c.aggregate([{$match: {a: 1}])", 31),
+    ("db.c.find({})", 5),
+    ("students.aggregate([])", 0),
+    ("db.c.aggregate([]) extra", 19),
+])
+def test_errors_report_the_offset(text, position):
+    with pytest.raises(MongoSyntaxError) as error:
+        parse_mongo_query(text)
+
+    assert error.value.position == position
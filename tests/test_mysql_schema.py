@@ -0,0 +1,56 @@
+from contextlib import contextmanager
+
+import app
+
+
+class FakePool:
+    def __init__(self, rows):
+        self.rows = rows
+
+    @contextmanager
+    def connection(self, db_name, read_only=False):
+        rows = self.rows
+
+        class Cursor:
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc_info):
+                return False
+
+            def execute(self, query, args=None):
+                pass
+
+            def fetchall(self):
+                return rows
+
+        class Connection:
+            def cursor(self):
+                return Cursor()
+
+        yield Connection()
+
+
+def test_schema_is_loaded_with_foreign_keys_and_row_counts(monkeypatch):
+    rows = [
+        ("courses", "CourseID", "int", "NO", "PRI", 40, None, None),
+        ("enrollments", "EnrollmentID", "int", "NO", "PRI", 5000, None, None),
+        # A column in two foreign keys comes back twice.
+        ("enrollments", "CourseID", "int", "YES", "MUL", 5000, "courses", "CourseID"),
+        ("enrollments", "CourseID", "int", "YES", "MUL", 5000, "catalog", "ID"),
+        ("recent", "CourseID", "int", "YES", "", None, None, None),
+    ]
+    monkeypatch.setattr(app, "mysql_pool", FakePool(rows))
+
+    schema, foreign_keys, row_counts = app.load_mysql_schema("school")
+
+    assert [column["name"] for column in schema["enrollments"]] == ["EnrollmentID", "CourseID"]
+    assert schema["courses"][0] == {
+        "name": "CourseID", "type": "int", "data_type": "int", "nullable": False, "key": "PRI"
+    }
+    assert foreign_keys == (
+        ("enrollments", "CourseID", "courses", "CourseID"),
+        ("enrollments", "CourseID", "catalog", "ID"),
+    )
+    # Views have no row estimate.
+    assert row_counts == {"courses": 40, "enrollments": 5000}
@@ -0,0 +1,38 @@
+import pytest
+
+import router
+from gemini import LLMUnavailableError
+from router import LLM_OPTION, RULES_OPTION, TranslatorRouter
+
+SCHEMA = {
+    "students": ["StudentID", "FirstName", "Major"],
+    "enrollments": ["EnrollmentID", "StudentID", "Grade"],
+}
+
+
+def fake_generator(monkeypatch, rule_sql):
+    """Make the rules answer ``rule_sql`` and the LLM fail."""
+
+    def query_generator(question, schema, database="sql", option=RULES_OPTION, **kwargs):
+        if option == LLM_OPTION:
+            raise LLMUnavailableError("The LLM circuit is open.")
+        return rule_sql
+
+    monkeypatch.setattr(router, "query_generator", query_generator)
+
+
+def test_invalid_rule_sql_is_not_served_when_the_llm_fails(monkeypatch):
+    fake_generator(monkeypatch, "SELECT students.FirstName FROM students WHERE Grade =;")
+
+    with pytest.raises(LLMUnavailableError):
+        TranslatorRouter().translate_sql("find FirstName, Grade where Grade = A", SCHEMA)
+
+
+def test_low_confidence_rule_sql_is_served_when_the_llm_fails(monkeypatch):
+    fake_generator(monkeypatch, "SELECT FirstName FROM students")
+    translator = TranslatorRouter()
+
+    route = translator.translate_sql("show FirstName and Major", SCHEMA)
+
+    assert (route.query, route.path, route.reason) == ("SELECT FirstName FROM students", "rules", "low_confidence")
+    assert translator.stats()["llm_failures_served_by_rules"] == 1
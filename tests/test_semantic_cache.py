@@ -0,0 +1,56 @@
+import numpy as np
+
+from semantic_cache import SemanticCache, embed_tokens, literal_guard, prompt_tokens, schema_identifiers
+
+SCHEMA = {
+    "courses": ["CourseID", "CourseName", "InstructorID", "InstructorName", "CreditHours"],
+    "enrollments": ["EnrollmentID", "StudentID", "CourseID", "Semester", "Grade"],
+    "students": ["StudentID", "FirstName", "LastName", "Email", "Major", "AdvisorID", "AdvisorName"],
+}
+
+FALL = ("find FirstName, LastName, Email, AdvisorName, CourseName, InstructorName "
+        "where Major = Physics and Semester = Fall")
+SPRING = FALL.replace("Fall", "Spring")
+
+
+def guard(prompt):
+    return literal_guard(prompt_tokens(prompt), schema_identifiers(SCHEMA))
+
+
+def test_unquoted_values_are_part_of_the_guard():
+    assert guard(FALL) != guard(SPRING)
+    assert "fall" in guard(FALL)
+    assert guard("grade > 90") != guard("grade > 80")
+
+
+def test_paraphrases_keep_the_same_guard():
+    assert guard("show me all rows in students where Major = Physics") == guard("list students where Major = Physics")
+
+
+def test_unquoted_value_change_is_a_miss_despite_high_similarity():
+    # The two prompts embed close enough to pass the threshold on their own.
+    similarity = float(np.dot(embed_tokens(prompt_tokens(FALL)), embed_tokens(prompt_tokens(SPRING))))
+    assert similarity >= 0.9
+
+    cache = SemanticCache(threshold=0.9)
+    cache.put(FALL, SCHEMA, "sql", "SELECT ... WHERE Semester = 'Fall'")
+
+    assert cache.get(SPRING, SCHEMA, "sql") is None
+    assert cache.get(FALL, SCHEMA, "sql") == "SELECT ... WHERE Semester = 'Fall'"
+    assert cache.stats()["guard_rejections"] == 1
+
+
+def test_other_schema_or_backend_is_a_miss():
+    cache = SemanticCache(threshold=0.9)
+    cache.put(FALL, SCHEMA, "sql", "SELECT 1")
+
+    assert cache.get(FALL, SCHEMA, "mongodb") is None
+    assert cache.get(FALL, {"students": ["Major"]}, "sql") is None
+
+
+def test_discarded_entry_is_a_miss():
+    cache = SemanticCache(threshold=0.9)
+    cache.put(FALL, SCHEMA, "sql", "SELECT 1")
+    cache.discard(FALL, SCHEMA, "sql")
+
+    assert cache.get(FALL, SCHEMA, "sql") is None
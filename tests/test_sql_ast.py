@@ -0,0 +1,98 @@
+import pytest
+
+from mongo_syntax import parse_mongo_query
+from regex import COMPILED_MONGO_RULES, render_mongo_query, select_shape
+from sql_ast import SQLTranslationError, translate_sql
+
+SCHEMA = {
+    "students": ["StudentID", "FirstName", "Major"],
+    "enrollments": ["EnrollmentID", "StudentID", "CourseID", "Grade"],
+}
+
+CASES = [
+    (
+        "SELECT * FROM students WHERE Major = 'CS' ORDER BY FirstName DESC LIMIT 5;",
+        ("students", [{"$match": {"Major": "CS"}}, {"$sort": {"FirstName": -1}}, {"$limit": 5}]),
+    ),
+    (
+        "SELECT DISTINCT Major FROM students;",
+        ("students", [{"$group": {"_id": {"Major": "$Major"}}}, {"$project": {"Major": "$_id.Major", "_id": 0}}]),
+    ),
+    (
+        "SELECT COUNT(*) FROM students WHERE Major IS NOT NULL;",
+        ("students", [{"$match": {"Major": {"$exists": True, "$ne": None}}}, {"$count": "total_count"}]),
+    ),
+    (
+        "SELECT * FROM students WHERE Major IS NULL;",
+        ("students", [{"$match": {"Major": {"$eq": None}}}]),
+    ),
+    (
+        "SELECT Major, COUNT(DISTINCT FirstName) AS names FROM students GROUP BY Major ORDER BY names DESC;",
+        ("students", [
+            {"$group": {"_id": {"Major": "$Major", "_value": "$FirstName"}}},
+            {"$group": {"_id": {"Major": "$_id.Major"},
+                        "names": {"$sum": {"$cond": [{"$eq": [{"$ifNull": ["$_id._value", None]}, None]}, 0, 1]}}}},
+            {"$sort": {"names": -1}},
+            {"$project": {"Major": "$_id.Major", "names": 1, "_id": 0}},
+        ]),
+    ),
+    (
+        "SELECT * FROM students WHERE FirstName LIKE 'A%' AND Major IN ('CS','EE');",
+        ("students", [{"$match": {
+            "FirstName": {"$regex": "^A", "$options": "i"}, "Major": {"$in": ["CS", "EE"]}
+        }}]),
+    ),
+    (
+        "SELECT Major, COUNT(*) AS n FROM students GROUP BY Major HAVING COUNT(*) > 2;",
+        ("students", [
+            {"$group": {"_id": {"Major": "$Major"}, "n": {"$sum": 1}}},
+            {"$match": {"$expr": {"$gt": ["$n", 2]}}},
+            {"$project": {"Major": "$_id.Major", "n": 1, "_id": 0}},
+        ]),
+    ),
+    (
+        "SELECT students.FirstName, enrollments.Grade FROM students "
+        "JOIN enrollments ON students.StudentID = enrollments.StudentID WHERE Grade > 90;",
+        ("students", [
+            {"$lookup": {"from": "enrollments", "localField": "StudentID", "foreignField": "StudentID",
+                         "as": "enrollments"}},
+            {"$unwind": "$enrollments"},
+            {"$match": {"enrollments.Grade": {"$gt": 90}}},
+            {"$project": {"FirstName": 1, "Grade": "$enrollments.Grade", "_id": 0}},
+        ]),
+    ),
+]
+
+
+@pytest.mark.parametrize("sql, expected", CASES)
+def test_translate_sql(sql, expected):
+    assert translate_sql(sql, SCHEMA) == expected
+
+
+@pytest.mark.parametrize("sql, expected", CASES)
+def test_rendered_pipeline_parses_back_to_the_same_query(sql, expected):
+    collection, pipeline = translate_sql(sql, SCHEMA)
+
+    assert parse_mongo_query(render_mongo_query(collection, pipeline)) == expected
+
+
+@pytest.mark.parametrize("sql", ["DELETE FROM students", "SELECT FROM students", "SELECT * FROM students WHERE"])
+def test_unsupported_sql_raises(sql):
+    with pytest.raises(SQLTranslationError):
+        translate_sql(sql, SCHEMA)
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT COUNT(*) FROM students;",
+    "SELECT COUNT(*) FROM enrollments WHERE Grade BETWEEN 60 AND 90;",
+    "SELECT COUNT(*) FROM students WHERE Major IS NULL;",
+    "SELECT COUNT(*) FROM students WHERE Major IS NOT NULL;",
+    "SELECT * FROM students WHERE Major IS NOT NULL;",
+    "SELECT COUNT(DISTINCT Major) AS distinct_count FROM students;",
+    "SELECT MAX(Grade) - MIN(Grade) FROM enrollments;",
+])
+def test_result_keys_and_predicates_match_the_sql_rules(sql):
+    rule = next(build(match) for _, pattern, build in COMPILED_MONGO_RULES[select_shape(sql)]
+                if (match := pattern.match(sql)))
+
+    assert translate_sql(sql, SCHEMA) == rule
@@ -0,0 +1,30 @@
+import pytest
+
+from regex import COMPILED_MONGO_RULES
+
+
+def apply_rule(shape, name, sql):
+    for rule_name, pattern, build in COMPILED_MONGO_RULES[shape]:
+        if rule_name == name:
+            match = pattern.match(sql)
+            assert match, f"{name} did not match {sql!r}"
+            return build(match)
+    raise KeyError(name)
+
+
+@pytest.mark.parametrize("order, expected", [("DESC", -1), ("desc", -1), ("ASC", 1), ("", 1)])
+def test_order_limit_rule_follows_the_sort_direction(order, expected):
+    sql = f"SELECT * FROM courses ORDER BY CreditHours {order} LIMIT 5;"
+
+    assert apply_rule("select_star", "order_limit", sql) == (
+        "courses", [{"$sort": {"CreditHours": expected}}, {"$limit": 5}]
+    )
+
+
+@pytest.mark.parametrize("sql, column, value", [
+    ("SELECT * FROM courses WHERE CreditHours != 35;", "CreditHours", 35),
+    ("SELECT * FROM courses WHERE CourseName != 'Data Science'", "CourseName", "Data Science"),
+    ("SELECT * FROM courses WHERE CourseName <> 'Math';", "CourseName", "Math"),
+])
+def test_not_equal_rule_captures_the_whole_value(sql, column, value):
+    assert apply_rule("select_star", "not_equal", sql) == ("courses", [{"$match": {column: {"$ne": value}}}])
@@ -0,0 +1,35 @@
+import io
+
+import pytest
+from pymongo import MongoClient
+from werkzeug.datastructures import FileStorage
+
+from app import upload_mongodb_file
+
+
+@pytest.fixture
+def db():
+    # connect=False: collection names are validated client-side, no server needed.
+    client = MongoClient("mongodb://localhost:1", connect=False, serverSelectionTimeoutMS=100)
+    yield client["chatdb_test"]
+    client.close()
+
+
+def upload(filename, text="id,name\n1,a\n"):
+    return FileStorage(stream=io.BytesIO(text.encode("utf-8")), filename=filename)
+
+
+@pytest.mark.parametrize("filename", [".csv", "a$b.csv"])
+def test_invalid_collection_name_is_a_per_file_error(db, filename):
+    result = upload_mongodb_file(db, upload(filename))
+
+    assert result["filename"] == filename
+    assert result["status"] == "error"
+    assert "collection names" in result["message"]
+
+
+def test_non_csv_file_is_rejected(db):
+    result = upload_mongodb_file(db, upload("notes.txt"))
+
+    assert result["status"] == "error"
+    assert result["message"] == "Invalid file format. Please upload a CSV file"
@@ -1,11 +1,18 @@
 import re
 import json
 import random
-from gemini import QueryER
+from gemini import get_query_translator
 from regex import *
+from mongo_syntax import parse_mongo_query
+from schema_index import schema_index_for
 from string import Template
 
 
+# Cache backend label for parsed (text, collection, pipeline) entries, kept
+# apart from the plain query text query_generator stores under "mongodb".
+MONGO_PIPELINE_BACKEND = "mongodb-pipeline"
+
+
 def extract_mongo_query(query_str):
     """
     Extract collection name and pipeline array from MongoDB query string using custom parser
@@ -15,166 +22,106 @@ def extract_mongo_query(query_str):
         
     Returns:
         tuple: (collection_name, pipeline_array)
+
+    Raises:
+        MongoSyntaxError: A ValueError carrying the offset of the first syntax error
     """
-    def parse_value(value_str):
-        """Parse a MongoDB value into Python object"""
-        value_str = value_str.strip()
-        
-        # Handle numbers
-        if value_str.isdigit():
-            return int(value_str)
-        try:
-            return float(value_str)
-        except ValueError:
-            pass
-            
-        # Handle booleans
-        if value_str.lower() == 'true':
-            return True
-        if value_str.lower() == 'false':
-            return False
-            
-        # Handle null
-        if value_str.lower() == 'null':
-            return None
-            
-        # Remove quotes if string
-        if value_str.startswith('"') or value_str.startswith("'"):
-            return value_str[1:-1]
-            
-        return value_str
+    return parse_mongo_query(query_str)
 
-    def parse_object(obj_str):
-        """Parse a MongoDB object into Python dict"""
-        obj_str = obj_str.strip()
-        if not obj_str.startswith('{') or not obj_str.endswith('}'):
-            raise ValueError(f"Invalid object format: {obj_str}")
-            
-        result = {}
-        # Remove curly braces
-        content = obj_str[1:-1].strip()
-        
-        if not content:
-            return result
-            
-        # Split by commas, but handle nested structures
-        parts = []
-        current = []
-        depth = 0
-        
-        for char in content:
-            if char in '{[':
-                depth += 1
-            elif char in '}]':
-                depth -= 1
-            elif char == ',' and depth == 0:
-                parts.append(''.join(current).strip())
-                current = []
-                continue
-            current.append(char)
-        
-        if current:
-            parts.append(''.join(current).strip())
-            
-        # Process each key-value pair
-        for part in parts:
-            if ':' not in part:
-                raise ValueError(f"Invalid key-value pair: {part}")
-            key, value = part.split(':', 1)
-            key = key.strip()
-            
-            # Remove quotes from key if present
-            if key.startswith('"') or key.startswith("'"):
-                key = key[1:-1]
-                
-            # Parse the value
-            value = value.strip()
-            if value.startswith('{'):
-                value = parse_object(value)
-            elif value.startswith('['):
-                value = parse_array(value)
-            else:
-                value = parse_value(value)
-                
-            result[key] = value
-            
-        return result
 
-    def parse_array(array_str):
-        """Parse a MongoDB array into Python list"""
-        array_str = array_str.strip()
-        if not array_str.startswith('[') or not array_str.endswith(']'):
-            raise ValueError(f"Invalid array format: {array_str}")
-            
-        # Remove brackets
-        content = array_str[1:-1].strip()
-        
-        if not content:
-            return []
-            
-        # Split by commas, but handle nested structures
-        parts = []
-        current = []
-        depth = 0
-        
-        for char in content:
-            if char in '{[':
-                depth += 1
-            elif char in '}]':
-                depth -= 1
-            elif char == ',' and depth == 0:
-                parts.append(''.join(current).strip())
-                current = []
-                continue
-            current.append(char)
-        
-        if current:
-            parts.append(''.join(current).strip())
-            
-        # Parse each value
-        result = []
-        for part in parts:
-            part = part.strip()
-            if part.startswith('{'):
-                value = parse_object(part)
-            elif part.startswith('['):
-                value = parse_array(part)
-            else:
-                value = parse_value(part)
-            result.append(value)
-            
-        return result
+def schema_column_names(schema):
+    """
+    Reduce a schema to table -> list of column names.
+
+    Accepts both plain name lists and typed column entries ({"name": ..., "type": ...}).
+    """
+    return {
+        table: [column["name"] if isinstance(column, dict) else column for column in columns]
+        for table, columns in schema.items()
+    }
+
+
+def schema_for_prompt(schema):
+    """Render typed columns as "name (type)" so the LLM sees the column types too."""
+    return {
+        table: [f"{column['name']} ({column['type']})" if isinstance(column, dict) else column for column in columns]
+        for table, columns in schema.items()
+    }
+
+
+def query_generator(query_str, schema, database,option, cache=None, semantic_cache=None, foreign_keys=(),
+                    row_counts=None):
+    """
+    Translate a question into a query for ``database`` ("sql" or "mongodb").
+
+    ``foreign_keys`` and ``row_counts`` are passed to the rule-based join
+    planner; the LLM does not use them.
+
+    When a ``TranslationCache`` is given, repeated questions against the same
+    schema are answered from it instead of being translated again. A
+    ``SemanticCache`` additionally serves LLM translations of paraphrased
+    questions.
+    """
+    if cache is not None:
+        key = cache.key(query_str, schema, database, option)
+        return cache.get(key, lambda: query_generator(query_str, schema, database, option, semantic_cache=semantic_cache,
+                                                      foreign_keys=foreign_keys, row_counts=row_counts))
 
-    # Extract collection name
-    collection_match = re.match(r'db\.(\w+)\.aggregate', query_str)
-    if not collection_match:
-        raise ValueError("Invalid query format. Must start with db.collection.aggregate")
-    
-    collection_name = collection_match.group(1)
-    
-    # Extract and parse pipeline array
-    pipeline_match = re.search(r'\[(.*)\]', query_str, re.DOTALL)
-    if not pipeline_match:
-        raise ValueError("Invalid query format. Must contain aggregation pipeline array")
-    
-    pipeline = parse_array(pipeline_match.group(0))
-    
-    return collection_name, pipeline
-        
-def query_generator(query_str, schema, database,option):
-    
     if option == 0:
+        schema_index = schema_index_for(schema)
         if database == "sql":
-            query =  query_function_sql(schema, query_str)
+            query =  query_function_sql(schema_index, query_str, foreign_keys, row_counts)
         elif database == "mongodb":
-            query = sql_to_mongo(query_function_sql(data_schema=schema,query=query_str))
+            column_schema = schema_column_names(schema)
+            query = render_mongo_query(*sql_to_mongo(query_function_sql(data_schema=schema_index,query=query_str), column_schema))
             # import pdb; pdb.set_trace()
     else:
-        decode= QueryER()
-        query = decode.decompose(query_str,dataschema=convert_schema_to_string(schema),database=database)
+        query = semantic_cache.get(query_str, schema, database) if semantic_cache is not None else None
+        if query is None:
+            decode = get_query_translator()
+            query = decode.decompose(query_str,dataschema=convert_schema_to_string(schema_for_prompt(schema)),database=database)
+            if semantic_cache is not None and query:
+                semantic_cache.put(query_str, schema, database, query)
     return query
 
 
+def mongo_query_generator(query_str, schema, option, cache=None, semantic_cache=None):
+    """
+    Translate a question into a MongoDB aggregation.
+
+    The rule-based path builds the pipeline as Python objects directly; only
+    LLM output is text that has to go through ``extract_mongo_query``. With a
+    ``TranslationCache`` only translations that parsed are stored, and the
+    cached pipeline is shared, so callers must not modify it. LLM text is
+    likewise added to the ``SemanticCache`` only once it has parsed.
+
+    Returns:
+        tuple: (query text for display, collection name, pipeline)
+    """
+    if cache is not None:
+        key = cache.key(query_str, schema, MONGO_PIPELINE_BACKEND, option)
+        return cache.get(key, lambda: mongo_query_generator(query_str, schema, option, semantic_cache=semantic_cache))
+
+    if option == 0:
+        column_schema = schema_column_names(schema)
+        sql_query = query_function_sql(data_schema=schema_index_for(schema), query=query_str)
+        if sql_query is None:
+            raise ValueError("No query template matches this question.")
+        collection_name, pipeline = sql_to_mongo(sql_query, column_schema)
+        return render_mongo_query(collection_name, pipeline), collection_name, pipeline
+
+    query = semantic_cache.get(query_str, schema, "mongodb") if semantic_cache is not None else None
+    if query is not None:
+        return (query, *extract_mongo_query(query))
+
+    query = query_generator(query_str, schema, database="mongodb", option=option)
+    query = query.replace('\\"', '"')
+    collection_name, pipeline = extract_mongo_query(query)
+    if semantic_cache is not None:
+        semantic_cache.put(query_str, schema, "mongodb", query)
+    return query, collection_name, pipeline
+
+
 def convert_schema_to_string(schema_dict):
 
     schema_str = json.dumps(schema_dict, indent=2, separators=(',', ': '))